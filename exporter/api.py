@@ -14,7 +14,7 @@ from tempfile import mkdtemp, mkstemp
 from django.utils.text import slugify
 from django.core.files.storage import default_storage
 from lore.settings import EXPORT_PATH_PREFIX
-from learningresources.models import STATIC_ASSET_BASEPATH
+from learningresources.models import static_asset_relative_path
 
 
 def _find_unused_path(path):
@@ -57,6 +57,8 @@ def export_resources_to_directory(learning_resources):
     tempdir = mkdtemp()
     collision = False
     type_dirs_created = set()
+    # Content hashes of the static files written so far, by path.
+    exported_hashes = {}
     try:
         os.mkdir(os.path.join(tempdir, "static"))
         for learning_resource in learning_resources:
@@ -77,17 +79,20 @@ def export_resources_to_directory(learning_resources):
 
             # Output to static directory.
             for static_asset in learning_resource.static_assets.all():
-                prefix = STATIC_ASSET_BASEPATH.format(
-                    org=static_asset.course.org,
-                    course_number=static_asset.course.course_number,
-                    run=static_asset.course.run,
+                asset_path = static_asset_relative_path(
+                    static_asset.course,
+                    static_asset.asset.name,
+                    static_asset.content_hash,
                 )
-                asset_path = static_asset.asset.name
-                if asset_path.startswith(prefix):
-                    asset_path = asset_path[len(prefix):]
 
                 static_path = os.path.join(tempdir, "static", asset_path)
+                # Identical contents at the same path aren't a collision.
+                if (static_asset.content_hash and
+                        exported_hashes.get(static_path) ==
+                        static_asset.content_hash):
+                    continue
                 static_path, found_collision = _find_unused_path(static_path)
+                exported_hashes[static_path] = static_asset.content_hash
                 if found_collision:
                     collision = found_collision
 
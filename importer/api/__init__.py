@@ -4,41 +4,85 @@ Import OLX data into LORE.
 
 from __future__ import unicode_literals
 
+from collections import defaultdict, namedtuple
+from functools import partial
+from hashlib import sha256
 from shutil import rmtree
 import logging
-from tempfile import mkdtemp
-from os.path import join, exists
-from os import listdir
+from math import ceil
+from tempfile import mkdtemp, TemporaryFile
+from os.path import join
 
-from bs4 import BeautifulSoup
-
-from archive import Archive, ArchiveException
+from django.conf import settings
+from django.core.files import File
 from django.core.files.storage import default_storage
 from django.db import transaction
 from lxml import etree
 from xbundle import XBundle, DESCRIPTOR_TAGS
 
+from importer.archives import CourseArchive
+from importer.progress import ImportProgress
 from importer.tasks import populate_xanalytics_fields
 from learningresources.api import (
     create_course,
-    create_resource,
     get_resources,
+    get_static_asset_index,
     get_video_sub,
-    import_static_assets,
     join_description_paths,
+    list_static_files,
     MissingTitle,
+    type_id_by_name,
+    update_static_assets,
+    upload_static_assets,
 )
 from learningresources.models import (
+    Course,
     LearningResource,
-    StaticAsset,
-    course_asset_basepath
+    LearningResourceType,
+)
+from search.utils import (
+    batched_index_deletes,
+    element_text,
+    index_resources,
+    INDEX_CHUNK_SIZE,
 )
-from search.utils import index_resources
 
 log = logging.getLogger(__name__)
 
+STATIC_PREFIX = "/static/"
+# Attributes the importer used to skip because BeautifulSoup's HTML tree
+# builder splits them into lists of tokens instead of strings.
+TOKEN_LIST_ATTRIBUTES = {
+    '*': {'class', 'accesskey', 'dropzone'},
+    'a': {'rel', 'rev'},
+    'link': {'rel', 'rev'},
+    'area': {'rel'},
+    'td': {'headers'},
+    'th': {'headers'},
+    'form': {'accept-charset'},
+    'object': {'archive'},
+    'icon': {'sizes'},
+    'iframe': {'sandbox'},
+    'output': {'for'},
+}
+# An element waiting to become a LearningResource, with the values it
+# inherits from its parent
+PendingResource = namedtuple("PendingResource", [
+    "element", "parent_id", "parent_dpath", "materialized_path",
+])
+# Columns read for the existing resources of a course being re-imported
+ExistingResource = namedtuple("ExistingResource", [
+    "id", "parent_id", "learning_resource_type_id", "title", "content_hash",
+    "materialized_path", "description_path", "url_name",
+])
+# Fields compared to tell whether a re-imported resource changed
+UPDATED_FIELDS = (
+    "title", "content_hash", "materialized_path", "description_path",
+    "url_name",
+)
+
 
-def import_course_from_file(filename, repo_id, user_id):
+def import_course_from_file(filename, repo_id, user_id, incremental=False):
     """
     Import OLX archive from .zip or tar.gz.
 
@@ -47,50 +91,149 @@ def import_course_from_file(filename, repo_id, user_id):
     root directory, or no course.xml in its root and a single occurrence of
     course.xml in one or more of the root directory's children.
 
+    Only the course XML is extracted to disk for XBundle. Static files are
+    uploaded straight from the archive.
+
     Args:
         filename (unicode): Path to archive file (zip or .tar.gz)
         repo_id (int): Primary key of repository course belongs to
         user_id (int): Primary key of user importing the course
+        incremental (bool): Update courses which were imported before
     Returns:
         None
     Raises:
         ValueError: Unable to extract or read archive contents.
     """
-    tempdir = mkdtemp()
-
-    # HACK: Have to patch in "seekable" attribute for python3 and tar
-    # See: https://code.djangoproject.com/ticket/24963#ticket. Remove
-    # when updating to Django 1.9
-    def seekable():
-        """Hacked seekable for django storage to work in python3"""
-        return True
     try:
-        course_archive = default_storage.open(filename)
-        course_archive.seekable = seekable
+        archive = open_course_archive(filename)
         try:
-            Archive(
-                course_archive
-            ).extract(to_path=tempdir, method="safe")
-        except ArchiveException as ex:
-            log.debug("failed to extract: %s", ex)
-            log.exception('Archive exception occurred')
-            raise ValueError("Invalid OLX archive, unable to extract.")
-        course_imported = False
-        if "course.xml" in listdir(tempdir):
-            import_course_from_path(tempdir, repo_id, user_id)
-            course_imported = True
-        else:
-            for path in listdir(tempdir):
-                if exists(join(tempdir, path, 'course.xml')):
-                    import_course_from_path(
-                        join(tempdir, path), repo_id, user_id
-                    )
-                    course_imported = True
-        if course_imported is False:
-            raise ValueError("Invalid OLX archive, no courses found.")
+            roots = archive.course_roots()
+            if len(roots) == 0:
+                raise ValueError("Invalid OLX archive, no courses found.")
+            for root in roots:
+                import_course_from_archive(
+                    archive, root, repo_id, user_id, incremental)
+        finally:
+            archive.close()
     finally:
         default_storage.delete(filename)
+
+
+# HACK: Have to patch in "seekable" attribute for python3 and tar
+# See: https://code.djangoproject.com/ticket/24963#ticket. Remove
+# when updating to Django 1.9
+def _seekable():
+    """Hacked seekable for django storage to work in python3"""
+    return True
+
+
+def open_course_archive(filename):
+    """
+    Open an uploaded OLX archive for reading.
+
+    Args:
+        filename (unicode): Path to archive file in default_storage
+    Returns:
+        importer.archives.CourseArchive
+    Raises:
+        ValueError: Unable to read archive.
+    """
+    course_archive = default_storage.open(filename)
+    course_archive.seekable = _seekable
+    try:
+        return CourseArchive(course_archive)
+    except ValueError:
+        course_archive.close()
+        raise
+
+
+def split_course_archive(filename):
+    """
+    Split an uploaded OLX archive holding several courses into one archive
+    per course, so each course can be imported without downloading the
+    others.
+
+    Args:
+        filename (unicode): Path to archive file in default_storage
+    Returns:
+        list: (course directory, archive path) tuples. The archive path is
+            filename itself if it only holds one course.
+    Raises:
+        ValueError: Unable to read archive or no courses found.
+    """
+    archive = open_course_archive(filename)
+    try:
+        roots = archive.course_roots()
+        if len(roots) == 0:
+            raise ValueError("Invalid OLX archive, no courses found.")
+        if len(roots) == 1:
+            return [(roots[0], filename)]
+        handles = {root: TemporaryFile() for root in roots}
+        try:
+            archive.split_courses(handles)
+            courses = []
+            try:
+                for index, root in enumerate(roots):
+                    handles[root].seek(0)
+                    courses.append((root, default_storage.save(
+                        "{filename}.{index}.tar.gz".format(
+                            filename=filename, index=index),
+                        File(handles[root])
+                    )))
+            except Exception:
+                for _, path in courses:
+                    default_storage.delete(path)
+                raise
+            return courses
+        finally:
+            for handle in handles.values():
+                handle.close()
+    finally:
+        archive.close()
+
+
+def import_course_from_archive(archive, root, repo_id, user_id,
+                               incremental=False, progress=None):
+    """
+    Import one course from an open OLX archive.
+
+    Args:
+        archive (importer.archives.CourseArchive): Archive holding the course
+        root (unicode): Course directory within the archive
+        repo_id (int): Primary key of repository course belongs to
+        user_id (int): Primary key of Django user doing the import
+        incremental (bool): Update the course if it was imported before
+        progress (importer.progress.ImportProgress): Progress to update
+    Returns:
+        course (learningresources.Course)
+    """
+    if progress is None:
+        progress = ImportProgress(root)
+    tempdir = mkdtemp()
+    try:
+        with progress.phase("extract"):
+            archive.extract_course(root, tempdir)
+        with progress.phase("parse"):
+            bundle = XBundle(
+                keep_urls=True, keep_studio_urls=True, preserve_url_name=True
+            )
+            bundle.import_from_directory(tempdir)
+        deleted_files = []
+        with transaction.atomic():
+            course = import_course(
+                bundle, repo_id, user_id, None,
+                static_files=archive.static_files(root),
+                incremental=incremental,
+                progress=progress,
+                deleted_files=deleted_files,
+            )
+        # Removed static files are only deleted once the import is
+        # committed, so rolling it back can't leave assets without files.
+        for name in deleted_files:
+            default_storage.delete(name)
+    finally:
         rmtree(tempdir)
+    return course
 
 
 def import_course_from_path(path, repo_id, user_id):
@@ -114,7 +257,8 @@ def import_course_from_path(path, repo_id, user_id):
     return course
 
 
-def import_course(bundle, repo_id, user_id, static_dir):
+def import_course(bundle, repo_id, user_id, static_dir, static_files=None,
+                  incremental=False, progress=None, deleted_files=None):
     """
     Import a course from an XBundle object.
 
@@ -123,10 +267,32 @@ def import_course(bundle, repo_id, user_id, static_dir):
         repo_id (int): Primary key of repository course belongs to
         user_id (int): Primary key of Django user doing the import
         static_dir (unicode): location of static files
+        static_files (list): (name, opener) tuples to upload instead of
+            the files in static_dir
+        incremental (bool): If the course was imported before, update it
+            in place instead of failing on the duplicate course.
+        progress (importer.progress.ImportProgress): Progress to update
+        deleted_files (list): If given, static files which a re-import
+            no longer uses are added to it for the caller to delete,
+            rather than deleted right away.
     Returns:
         learningresources.models.Course
     """
+    if progress is None:
+        progress = ImportProgress()
     src = bundle.course
+    if incremental:
+        course = Course.objects.filter(
+            repository__id=repo_id,
+            org=src.attrib["org"],
+            course_number=src.attrib["course"],
+            run=src.attrib["semester"],
+        ).first()
+        if course is not None:
+            return reimport_course(
+                course, src, static_dir, static_files, progress,
+                deleted_files)
+
     course = create_course(
         org=src.attrib["org"],
         repo_id=repo_id,
@@ -134,17 +300,95 @@ def import_course(bundle, repo_id, user_id, static_dir):
         run=src.attrib["semester"],
         user_id=user_id,
     )
-    import_static_assets(course, static_dir)
-    import_children(course, src, None, '')
+    if static_files is None:
+        static_files = list_static_files(static_dir)
+    progress.update(assets_total=len(static_files))
+    with progress.phase("static_upload"):
+        failed = upload_static_assets(
+            course, static_files,
+            on_upload=partial(progress.advance, "assets_uploaded"),
+        )
+    if len(failed) > 0:
+        log.warning(
+            "Course %s imported without static assets: %s",
+            course.id, ", ".join(failed)
+        )
+    import_children(
+        course, src, None, '', get_static_asset_index(course), progress)
     populate_xanalytics_fields.delay(course.id)
     # This triggers a bulk indexing of all LearningResource instances
     # for the course at once.
-    index_resources(
+    _index_imported_resources(
         get_resources(repo_id).filter(
-            course__id=course.id).values_list("id", flat=True))
+            course__id=course.id).values_list("id", flat=True),
+        progress
+    )
     return course
 
 
+def reimport_course(course, src, static_dir, static_files=None,
+                    progress=None, deleted_files=None):
+    """
+    Update a previously imported course from a new copy of its OLX.
+
+    Only resources and static assets which changed are written, and only
+    changed resources are reindexed.
+
+    Args:
+        course (learningresources.models.Course): Course to update
+        src (lxml.etree): Root course element of the xbundle
+        static_dir (unicode): location of static files
+        static_files (list): (name, opener) tuples to use instead of
+            the files in static_dir
+        progress (importer.progress.ImportProgress): Progress to update
+        deleted_files (list): If given, static files which are no longer
+            used are added to it for the caller to delete.
+    Returns:
+        learningresources.models.Course
+    """
+    if progress is None:
+        progress = ImportProgress()
+    if static_files is None:
+        static_files = list_static_files(static_dir)
+    progress.update(assets_total=len(static_files))
+    with progress.phase("static_upload"):
+        failed = update_static_assets(
+            course, static_files,
+            on_upload=partial(progress.advance, "assets_uploaded"),
+            deleted_files=deleted_files,
+        )
+    if len(failed) > 0:
+        log.warning(
+            "Course %s re-imported without static assets: %s",
+            course.id, ", ".join(failed)
+        )
+    changed_ids = update_children(
+        course, src, get_static_asset_index(course), progress)
+    populate_xanalytics_fields.delay(course.id)
+    _index_imported_resources(changed_ids, progress)
+    return course
+
+
+def _index_imported_resources(resource_ids, progress):
+    """
+    Index the resources of an import, counting chunks as they finish.
+
+    Args:
+        resource_ids (iterable): LearningResource ids to index
+        progress (importer.progress.ImportProgress): Progress to update
+    """
+    resource_ids = list(resource_ids)
+    progress.update(index_chunks_total=int(
+        ceil(len(resource_ids) / float(INDEX_CHUNK_SIZE))))
+    with progress.phase("indexing"):
+        index_resources(
+            resource_ids,
+            on_chunk=partial(progress.advance, "index_chunks_done"),
+            # The course is listed as soon as the import reports success.
+            refresh=True,
+        )
+
+
 def is_leaf_tag(tag):
     """
     Should we look for resources within elements with this tag?
@@ -157,77 +401,209 @@ def is_leaf_tag(tag):
     return tag in {'video', 'html', 'problem', 'discussion'}
 
 
-# pylint: disable=too-many-branches
-def import_children(course, element, parent, parent_dpath):
+def import_children(course, element, parent, parent_dpath,
+                    static_assets=None, progress=None):
     """
     Create LearningResource instances for each element
     of an XML tree.
 
+    The tree is walked breadth first so that every level can be written
+    with ``bulk_create`` once the level above it has been saved. Rows are
+    inserted in batches of ``settings.IMPORT_BATCH_SIZE``.
+
     Args:
         course (learningresources.models.Course): Course
         element (lxml.etree): XML element within xbundle
         parent (learningresources.models.LearningResource):
             Parent LearningResource
         parent_dpath (unicode): parent description path
+        static_assets (dict): StaticAsset ids keyed by relative path, as
+            returned by ``get_static_asset_index``. Looked up if None.
+        progress (importer.progress.ImportProgress): Progress to update
     Returns:
         None
     """
-    # pylint: disable=too-many-locals
-    title = element.attrib.get(
-        "display_name", MissingTitle.for_title_field)
-    desc_path = title
-    if desc_path == MissingTitle.for_title_field:
-        desc_path = MissingTitle.for_desc_path_field
-    mpath = etree.ElementTree(element).getpath(element)
-    dpath = join_description_paths(parent_dpath, desc_path)
-    url_name = element.attrib.get(
-        "url_name",
-        element.attrib.get("display_name", None)
-    )
-    resource = create_resource(
-        course=course, parent=parent, resource_type=element.tag,
-        title=title,
-        content_xml=etree.tostring(element),
-        mpath=mpath,
-        url_name=url_name,
-        dpath=dpath,
-    )
-    # temp variable to store static assets for bulk insert
-    static_assets_to_save = set()
-    target = "/static/"
-    if element.tag == "video":  # pylint: disable=too-many-nested-blocks
-        subname = get_video_sub(element)
-        if subname != "":
-            assets = StaticAsset.objects.filter(
-                course__id=resource.course_id,
-                asset=course_asset_basepath(course, subname),
-            )
-            for asset in assets:
-                static_assets_to_save.add((resource, asset))
-    else:
-        # Recursively find all sub-elements, looking for anything which
-        # refers to /static/. Then make the association between the
-        # LearningResource and StaticAsset if the StaticAsset exists.
-        # This is like doing soup.findAll("a") and checking for whether
-        # "/static/" is in the href, which would work but also requires
-        # more code to check for link, img, iframe, script, and others,
-        # and within those, check for href or src existing.
-        soup = BeautifulSoup(etree.tostring(element), 'lxml')
-        for child in soup.findAll():
-            for _, val in child.attrs.items():
-                try:
-                    if val.startswith(target):
-                        path = val[len(target):]
-                        try:
-                            asset = StaticAsset.objects.get(
-                                course__id=resource.course_id,
-                                asset=course_asset_basepath(course, path),
-                            )
-                            static_assets_to_save.add((resource, asset))
-                        except StaticAsset.DoesNotExist:
-                            continue
-                except AttributeError:
-                    continue  # not a string
+    if static_assets is None:
+        static_assets = get_static_asset_index(course)
+    if progress is None:
+        progress = ImportProgress()
+    progress.update(elements_total=count_resource_elements(element))
+    type_ids = dict(LearningResourceType.objects.values_list("name", "id"))
+    parent_id = parent.id if parent is not None else None
+    level = [PendingResource(
+        element, parent_id, parent_dpath, element_path(element))]
+    resource_elements = {}
+    with progress.phase("resources"):
+        while len(level) > 0:
+            next_level = []
+            for start in range(0, len(level), settings.IMPORT_BATCH_SIZE):
+                batch = level[start:start + settings.IMPORT_BATCH_SIZE]
+                next_level.extend(_import_resource_batch(
+                    course, batch, type_ids, resource_elements
+                ))
+                progress.advance("elements_processed", len(batch))
+            level = next_level
+
+    with progress.phase("asset_linking"):
+        _link_static_assets(element, resource_elements, static_assets)
+
+
+def update_children(course, element, static_assets=None, progress=None):
+    """
+    Update a course's LearningResources to match a new XML tree.
+
+    Elements are matched to existing resources by ``url_name``, falling
+    back to ``materialized_path``. Matched resources keep their ids, and
+    so their taxonomy terms, and are only written to if something about
+    them changed. Unmatched elements become new resources and resources
+    with no element left are deleted.
+
+    Args:
+        course (learningresources.models.Course): Course
+        element (lxml.etree): Root XML element within xbundle
+        static_assets (dict): StaticAsset ids keyed by relative path, as
+            returned by ``get_static_asset_index``. Looked up if None.
+        progress (importer.progress.ImportProgress): Progress to update
+    Returns:
+        list: Ids of the resources which were created or changed.
+    """
+    if static_assets is None:
+        static_assets = get_static_asset_index(course)
+    if progress is None:
+        progress = ImportProgress()
+    progress.update(elements_total=count_resource_elements(element))
+    type_ids = dict(LearningResourceType.objects.values_list("name", "id"))
+    existing = [
+        ExistingResource(*row) for row in LearningResource.objects.filter(
+            course__id=course.id
+        ).values_list(*ExistingResource._fields)
+    ]
+    by_path = {row.materialized_path: row for row in existing}
+    by_url_name = defaultdict(list)
+    for row in existing:
+        if row.url_name is not None:
+            by_url_name[
+                row.learning_resource_type_id, row.url_name].append(row)
+    max_id = max([row.id for row in existing] or [0])
+
+    changed_ids = []
+    resource_elements = {}
+    level = [PendingResource(element, None, '', element_path(element))]
+    with progress.phase("resources"):
+        while len(level) > 0:
+            next_level = []
+            new_batch = []
+            for item in level:
+                child, parent_id = item.element, item.parent_id
+                fields = _resource_fields(item, type_ids)
+                row = _match_resource(fields, by_path, by_url_name)
+                if row is None:
+                    new_batch.append(item)
+                    continue
+                changes = {
+                    name: fields[name]
+                    for name in UPDATED_FIELDS
+                    if getattr(row, name) != fields[name]
+                }
+                if row.parent_id != parent_id:
+                    changes["parent_id"] = parent_id
+                if row.content_hash != fields["content_hash"]:
+                    changes["content_xml"] = fields["content_xml"]
+                    changes["content_stripped"] = element_text(child)
+                if len(changes) > 0:
+                    LearningResource.objects.filter(
+                        id=row.id).update(**changes)
+                    changed_ids.append(row.id)
+                resource_elements[child] = row.id
+                next_level.extend(_resource_children(
+                    child, row.id, fields["description_path"],
+                    fields["materialized_path"]))
+            progress.advance(
+                "elements_processed", len(level) - len(new_batch))
+
+            for start in range(
+                    0, len(new_batch), settings.IMPORT_BATCH_SIZE):
+                batch = new_batch[start:start + settings.IMPORT_BATCH_SIZE]
+                next_level.extend(_import_resource_batch(
+                    course, batch, type_ids, resource_elements,
+                    after_id=max_id
+                ))
+                changed_ids.extend(
+                    resource_elements[item.element] for item in batch)
+                progress.advance("elements_processed", len(batch))
+            level = next_level
+
+        kept_ids = set(resource_elements.values())
+        # Deleting sends post_delete, which removes the rows from the index.
+        with batched_index_deletes():
+            LearningResource.objects.filter(id__in=[
+                row.id for row in existing if row.id not in kept_ids
+            ]).delete()
+
+    with progress.phase("asset_linking"):
+        ThroughModel = LearningResource.static_assets.through
+        ThroughModel.objects.filter(
+            learningresource__course__id=course.id).delete()
+        _link_static_assets(element, resource_elements, static_assets)
+    return changed_ids
+
+
+def _match_resource(fields, by_path, by_url_name):
+    """
+    Find the existing resource for an element and claim it.
+
+    Args:
+        fields (dict): Fields for the element from _resource_fields
+        by_path (dict): Unclaimed ExistingResources by materialized path
+        by_url_name (dict): Unclaimed ExistingResources by type id and
+            url_name
+    Returns:
+        ExistingResource: The matching resource, or None if there is none.
+    """
+    type_id = fields["learning_resource_type_id"]
+    row = by_path.get(fields["materialized_path"])
+    # A resource with another url_name at the path was moved there by a
+    # sibling being added or removed, so it's a different element.
+    if row is not None and (
+            row.learning_resource_type_id != type_id or
+            row.url_name not in (None, fields["url_name"])
+    ):
+        row = None
+    # url_name survives siblings being added or removed, the path doesn't.
+    if row is None or row.url_name != fields["url_name"]:
+        candidates = by_url_name.get((type_id, fields["url_name"]), [])
+        if len(candidates) == 1:
+            row = candidates[0]
+    if row is None:
+        return None
+    by_path.pop(row.materialized_path, None)
+    if row.url_name is not None:
+        candidates = by_url_name[row.learning_resource_type_id, row.url_name]
+        candidates.remove(row)
+    return row
+
+
+def _link_static_assets(element, resource_elements, static_assets):
+    """
+    Link LearningResources to the static assets they reference.
+
+    Args:
+        element (lxml.etree): Root XML element of the imported tree
+        resource_elements (dict): LearningResource ids keyed by element
+        static_assets (dict): StaticAsset ids keyed by relative path
+    """
+    asset_links = set()
+    references = find_static_references(element, resource_elements)
+    for resource_element, resource_id in resource_elements.items():
+        if resource_element.tag == "video":
+            paths = [get_video_sub(resource_element)]
+        else:
+            paths = references.get(resource_id, ())
+        asset_links.update(
+            (resource_id, static_assets[path])
+            for path in paths if path in static_assets
+        )
+
     # Bulk insert of static assets
     # Using this approach to avoid signals during the learning resource .save()
     # Each signal triggers a reindex of the learning resource that is useless
@@ -237,17 +613,220 @@ def import_children(course, element, parent, parent_dpath):
     ThroughModel.objects.bulk_create(
         [
             ThroughModel(
-                learningresource_id=resource.id,
-                staticasset_id=asset.id
+                learningresource_id=resource_id,
+                staticasset_id=asset_id
             )
-            for resource, asset in static_assets_to_save
+            for resource_id, asset_id in asset_links
         ]
     )
 
+
+def _resource_fields(pending, type_ids):
+    """
+    Compute the LearningResource fields for an element.
+
+    Args:
+        pending (PendingResource): Element and values from its parent
+        type_ids (dict): LearningResourceType ids by name, updated in place
+    Returns:
+        dict: Field values, excluding course and parent.
+    """
+    element = pending.element
+    title = element.attrib.get(
+        "display_name", MissingTitle.for_title_field)
+    desc_path = title
+    if desc_path == MissingTitle.for_title_field:
+        desc_path = MissingTitle.for_desc_path_field
+    type_name = element.tag.lower()
+    if type_name not in type_ids:
+        type_ids[type_name] = type_id_by_name(type_name)
+    content_xml = etree.tostring(element)
+    return {
+        "learning_resource_type_id": type_ids[type_name],
+        "title": title,
+        "content_xml": content_xml,
+        "content_hash": sha256(content_xml).hexdigest(),
+        "materialized_path": pending.materialized_path,
+        "url_name": element.attrib.get(
+            "url_name",
+            element.attrib.get("display_name", None)
+        ),
+        "description_path": join_description_paths(
+            pending.parent_dpath, desc_path),
+    }
+
+
+def element_path(element):
+    """
+    Get the materialized path of an element from its ancestors.
+
+    Args:
+        element (lxml.etree): XML element within xbundle
+    Returns:
+        unicode: XPath to the element, as from ``ElementTree.getpath``
+    """
+    return etree.ElementTree(element).getpath(element)
+
+
+def _resource_children(element, resource_id, dpath, mpath):
+    """
+    List the children of an element which should become resources.
+
+    Child paths are built from the parent's path the way libxml2 builds
+    them for ``getpath``: an element gets a 1-based position among the
+    siblings sharing its tag, but only if there is more than one.
+
+    Args:
+        element (lxml.etree): XML element for a resource
+        resource_id (int): Primary key of the element's resource
+        dpath (unicode): Description path of the element's resource
+        mpath (unicode): Materialized path of the element
+    Returns:
+        list: PendingResources for the children
+    """
     # Try to protect against bad data, specifically <problem><problem>...
-    # imports. The two tags will still appear in content_xml but there will
-    # be only one resource for the outer one.
-    if not is_leaf_tag(element.tag):
-        for child in element.getchildren():
-            if child.tag in DESCRIPTOR_TAGS:
-                import_children(course, child, resource, dpath)
+    # imports. The two tags will still appear in content_xml but there
+    # will be only one resource for the outer one.
+    if is_leaf_tag(element.tag):
+        return []
+    children = [
+        child for child in element.iterchildren()
+        if child.tag in DESCRIPTOR_TAGS
+    ]
+    tag_counts = {}
+    for child in children:
+        tag_counts[child.tag] = tag_counts.get(child.tag, 0) + 1
+    positions = {}
+    prefix = mpath + "/"
+    pending = []
+    for child in children:
+        tag = child.tag
+        if tag_counts[tag] > 1:
+            positions[tag] = positions.get(tag, 0) + 1
+            child_path = "{0}{1}[{2}]".format(prefix, tag, positions[tag])
+        else:
+            child_path = prefix + tag
+        pending.append(
+            PendingResource(child, resource_id, dpath, child_path))
+    return pending
+
+
+def count_resource_elements(element):
+    """
+    Count the elements of an XML tree which become LearningResources.
+
+    Args:
+        element (lxml.etree): Root XML element within xbundle
+    Returns:
+        int: Number of resource elements, including the root.
+    """
+    count = 0
+    stack = [element]
+    while len(stack) > 0:
+        count += 1
+        stack.extend(
+            pending.element for pending in
+            _resource_children(stack.pop(), None, '', '')
+        )
+    return count
+
+
+def _import_resource_batch(course, batch, type_ids, resource_elements,
+                           after_id=0):
+    """
+    Bulk insert LearningResources for elements sharing the same depth.
+
+    Args:
+        course (learningresources.models.Course): Course
+        batch (list): PendingResources
+        type_ids (dict): LearningResourceType ids by name, updated in place
+        resource_elements (dict): LearningResource ids keyed by element,
+            updated in place
+        after_id (int): Ids of the new rows are greater than this. Lets
+            new rows be told apart from existing ones at the same path.
+    Returns:
+        list: PendingResources for the children of this batch which
+            should become resources.
+    """
+    resources = []
+    for pending in batch:
+        resources.append(LearningResource(
+            course_id=course.id,
+            parent_id=pending.parent_id,
+            content_stripped=element_text(pending.element),
+            **_resource_fields(pending, type_ids)
+        ))
+
+    # bulk_create doesn't set primary keys, so look them up afterwards
+    # using the materialized path, which is unique within a course.
+    LearningResource.objects.bulk_create(resources)
+    resource_ids = dict(LearningResource.objects.filter(
+        course__id=course.id,
+        id__gt=after_id,
+        materialized_path__in=[
+            resource.materialized_path for resource in resources
+        ],
+    ).values_list("materialized_path", "id"))
+
+    children = []
+    for pending, resource in zip(batch, resources):
+        resource_id = resource_ids[resource.materialized_path]
+        resource_elements[pending.element] = resource_id
+        children.extend(_resource_children(
+            pending.element, resource_id, resource.description_path,
+            resource.materialized_path))
+    return children
+
+
+def _is_token_list(tag, name):
+    """
+    Whether BeautifulSoup would have split the attribute into tokens.
+
+    Args:
+        tag (unicode): Element tag
+        name (unicode): Attribute name
+    Returns:
+        bool: True if the attribute was never matched by the importer
+    """
+    name = name.lower()
+    return (
+        name in TOKEN_LIST_ATTRIBUTES['*'] or
+        name in TOKEN_LIST_ATTRIBUTES.get(tag.lower(), ())
+    )
+
+
+def find_static_references(root, resources):
+    """
+    Collect the /static/ references of LearningResources in a single walk
+    of the XML tree.
+
+    A reference found in an element's attributes belongs to the nearest
+    enclosing resource and to every resource above it, since each of
+    those resources contains the element in its content_xml. Videos are
+    linked to their subtitles only, so they don't collect references.
+
+    Args:
+        root (lxml.etree): XML element to scan, including its descendants
+        resources (dict): LearningResource ids keyed by element
+    Returns:
+        dict: Sets of paths relative to the static directory, keyed by
+            LearningResource id
+    """
+    references = defaultdict(set)
+    enclosing = []
+    for event, element in etree.iterwalk(
+            root, events=("start", "end"), tag=etree.Element):
+        collects = element in resources and element.tag != "video"
+        if event == "end":
+            if collects:
+                enclosing.pop()
+            continue
+        if collects:
+            enclosing.append(references[resources[element]])
+        for name, value in element.attrib.items():
+            if value.startswith(STATIC_PREFIX) and not _is_token_list(
+                    element.tag, name):
+                path = value[len(STATIC_PREFIX):]
+                for paths in enclosing:
+                    paths.add(path)
+    return dict(references)
@@ -0,0 +1,282 @@
+"""
+Read OLX course archives without extracting them in full.
+"""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import logging
+import os
+import posixpath
+import shutil
+import tarfile
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+import zipfile
+
+log = logging.getLogger(__name__)
+
+# Static files smaller than this are buffered in memory while uploading.
+SPOOL_MAX_SIZE = 10 * 1024 * 1024
+STATIC_DIR = "static"
+
+
+class CourseArchive(object):
+    """
+    A zip or tar archive holding one or more OLX courses.
+
+    Members are read straight from the archive. Only the files XBundle
+    needs are written to disk; static files are handed out one at a time
+    so they can be uploaded without extracting them.
+
+    Static files are read in archive order whatever order they are asked
+    for in, since going back in a compressed tar means decompressing it
+    again from the start. Files further on than the one asked for are
+    read ahead and kept until they are asked for.
+    """
+
+    def __init__(self, handle):
+        """
+        Open the archive.
+
+        Args:
+            handle (file): Seekable file object for a .zip or .tar.gz
+        Raises:
+            ValueError: Unable to read the archive.
+        """
+        self._handle = handle
+        self._lock = Lock()
+        try:
+            if zipfile.is_zipfile(handle):
+                handle.seek(0)
+                self._zip = zipfile.ZipFile(handle)
+                self._tar = None
+                members = [
+                    info.filename for info in sorted(
+                        self._zip.infolist(),
+                        key=lambda info: info.header_offset
+                    )
+                    if not info.filename.endswith("/")
+                ]
+            else:
+                handle.seek(0)
+                self._zip = None
+                self._tar = tarfile.open(fileobj=handle, mode="r:*")
+                self._tar_members = OrderedDict()
+                for info in sorted(
+                        self._tar.getmembers(), key=lambda info: info.offset
+                ):
+                    if info.isfile():
+                        self._tar_members[_normalize(info.name)] = info
+                members = list(self._tar_members)
+        except (tarfile.TarError, zipfile.BadZipfile, IOError, EOFError) as ex:
+            log.debug("failed to open archive: %s", ex)
+            log.exception('Archive exception occurred')
+            raise ValueError("Invalid OLX archive, unable to extract.")
+
+        # Normalized member names in archive order
+        self._names = OrderedDict()
+        for name in members:
+            normalized = _normalize(name)
+            if normalized.startswith("../") or posixpath.isabs(normalized):
+                raise ValueError("Invalid OLX archive, unable to extract.")
+            self._names[normalized] = name
+        self._order = list(self._names)
+        self._positions = {
+            name: position for position, name in enumerate(self._order)}
+        # Position of the member after the last one read by read_to_file
+        self._next = 0
+        # Static files handed out which haven't been read yet
+        self._wanted = set()
+        # Static files read ahead of being asked for
+        self._read_ahead = {}
+
+    def close(self):
+        """Close the archive and the file it was read from."""
+        for spooled in self._read_ahead.values():
+            spooled.close()
+        self._read_ahead = {}
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+        self._handle.close()
+
+    def course_roots(self):
+        """
+        Find the directories holding courses.
+
+        A valid OLX archive has a single occurrence of the file course.xml
+        in its root directory, or no course.xml in its root and a single
+        occurrence of course.xml in one or more of the root directory's
+        children.
+
+        Returns:
+            list: Course directories within the archive, '' for the root.
+        """
+        if "course.xml" in self._names:
+            return [""]
+        return sorted(
+            name[:-len("/course.xml")] for name in self._names
+            if name.count("/") == 1 and name.endswith("/course.xml")
+        )
+
+    def extract_course(self, root, path):
+        """
+        Write a course's files, except its static files, below path.
+
+        Args:
+            root (unicode): Course directory within the archive
+            path (unicode): Directory to write to
+        """
+        static_prefix = posixpath.join(root, STATIC_DIR) + "/"
+        for name in self._members_below(root):
+            if name.startswith(static_prefix):
+                continue
+            target = os.path.join(path, *_relative(root, name).split("/"))
+            directory = os.path.dirname(target)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with self._open_member(name) as member, \
+                    open(target, "wb") as output:
+                shutil.copyfileobj(member, output)
+
+    def split_courses(self, handles):
+        """
+        Write each course to its own .tar.gz in one pass over the archive.
+
+        Member names are kept, so a course's root is the same in its own
+        archive as in this one.
+
+        Args:
+            handles (dict): Writable file objects keyed by course root
+        """
+        tars = {
+            root: tarfile.open(fileobj=handle, mode="w:gz")
+            for root, handle in handles.items()
+        }
+        try:
+            for name in self._order:
+                root = name.split("/")[0]
+                if root not in tars:
+                    continue
+                info = tarfile.TarInfo(name)
+                info.size = self._member_size(name)
+                with self._open_member(name) as member:
+                    tars[root].addfile(info, member)
+        finally:
+            for tar in tars.values():
+                tar.close()
+
+    def static_files(self, root):
+        """
+        List a course's static files.
+
+        Args:
+            root (unicode): Course directory within the archive
+        Returns:
+            list: (name, opener) tuples as expected by
+                learningresources.api.upload_static_assets
+        """
+        static_root = posixpath.join(root, STATIC_DIR)
+        names = self._members_below(static_root)
+        with self._lock:
+            self._wanted.update(names)
+        return [
+            (_relative(static_root, name), _Opener(self, name))
+            for name in names
+        ]
+
+    def read_to_file(self, name):
+        """
+        Copy a member out of the archive. Safe to call from several
+        threads; members are read one at a time, in archive order.
+
+        Static files handed out by static_files() which come before name
+        in the archive are read first and kept for when they're asked for.
+
+        Args:
+            name (unicode): Normalized member name
+        Returns:
+            SpooledTemporaryFile: The contents, rewound
+        """
+        with self._lock:
+            spooled = self._read_ahead.pop(name, None)
+            if spooled is not None:
+                return spooled
+            position = self._positions[name]
+            if position >= self._next:
+                for ahead in self._order[self._next:position]:
+                    if ahead in self._wanted:
+                        self._wanted.discard(ahead)
+                        self._read_ahead[ahead] = self._spool(ahead)
+                self._next = position + 1
+            # Otherwise this is a retry, which has to go back.
+            self._wanted.discard(name)
+            return self._spool(name)
+
+    def _spool(self, name):
+        """Copy a member to a rewound temporary file."""
+        spooled = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        with self._open_member(name) as member:
+            shutil.copyfileobj(member, spooled)
+        spooled.seek(0)
+        return spooled
+
+    def _members_below(self, root):
+        """Normalized names of files below a directory, in archive order."""
+        prefix = root + "/" if root else ""
+        return [name for name in self._names if name.startswith(prefix)]
+
+    def _member_size(self, name):
+        """Uncompressed size of a member."""
+        if self._zip is not None:
+            return self._zip.getinfo(self._names[name]).file_size
+        return self._tar_members[name].size
+
+    def _open_member(self, name):
+        """Open a member for reading."""
+        if self._zip is not None:
+            return self._zip.open(self._names[name])
+        return _closing(self._tar.extractfile(self._tar_members[name]))
+
+
+class _Opener(object):
+    """Callable returning a static file's contents from the archive."""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, archive, name):
+        self.archive = archive
+        self.name = name
+
+    def __call__(self):
+        return self.archive.read_to_file(self.name)
+
+
+class _closing(object):
+    """
+    Context manager for tar members, which aren't context managers
+    in Python 2.
+    """
+    # pylint: disable=invalid-name,too-few-public-methods
+
+    def __init__(self, member):
+        self.member = member
+
+    def __enter__(self):
+        return self.member
+
+    def __exit__(self, *args):
+        self.member.close()
+
+
+def _normalize(name):
+    """Normalize an archive member name, dropping any leading './'."""
+    return posixpath.normpath(name.replace("\\", "/"))
+
+
+def _relative(root, name):
+    """Path of name relative to the root directory."""
+    if root == "":
+        return name
+    return name[len(root) + 1:]
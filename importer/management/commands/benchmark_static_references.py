@@ -0,0 +1,143 @@
+"""
+Management command to time static reference scanning on a synthetic course.
+"""
+
+from __future__ import unicode_literals
+
+from timeit import default_timer
+
+from bs4 import BeautifulSoup
+from django.core.management.base import BaseCommand, CommandError
+from lxml import etree
+from xbundle import DESCRIPTOR_TAGS
+
+from importer.api import STATIC_PREFIX, find_static_references, is_leaf_tag
+
+
+def make_course(depth, width):
+    """
+    Build a synthetic course tree.
+
+    Args:
+        depth (int): Number of nested vertical levels below each sequential
+        width (int): Number of children at every level
+    Returns:
+        lxml.etree: The course element
+    """
+    course = etree.Element(
+        "course", org="Bench", course="0.001", semester="Bench")
+
+    def add_children(parent, level):
+        """Add verticals until depth is reached, then html leaves."""
+        for index in range(width):
+            if level < depth:
+                child = etree.SubElement(parent, "vertical")
+                add_children(child, level + 1)
+            else:
+                html = etree.SubElement(parent, "html")
+                etree.SubElement(
+                    html, "img",
+                    src="{prefix}img_{level}_{index}.png".format(
+                        prefix=STATIC_PREFIX, level=level, index=index)
+                )
+                etree.SubElement(
+                    html, "a", href="{prefix}handout.pdf".format(
+                        prefix=STATIC_PREFIX)
+                )
+
+    for _ in range(width):
+        chapter = etree.SubElement(course, "chapter")
+        sequential = etree.SubElement(chapter, "sequential")
+        add_children(sequential, 1)
+    return course
+
+
+def resource_elements(course):
+    """
+    Number the elements which the importer turns into LearningResources.
+
+    Args:
+        course (lxml.etree): The course element
+    Returns:
+        dict: Fake LearningResource ids keyed by element
+    """
+    resources = {}
+    elements = [course]
+    while len(elements) > 0:
+        element = elements.pop()
+        resources[element] = len(resources)
+        if not is_leaf_tag(element.tag):
+            elements.extend(
+                child for child in element.getchildren()
+                if child.tag in DESCRIPTOR_TAGS
+            )
+    return resources
+
+
+def soup_references(resources):
+    """
+    Find references the way the importer did before the single pass
+    scanner, by parsing every resource's serialized subtree.
+
+    Args:
+        resources (dict): Fake LearningResource ids keyed by element
+    Returns:
+        dict: Sets of referenced paths keyed by resource id
+    """
+    references = {}
+    for element, resource_id in resources.items():
+        if element.tag == "video":
+            continue
+        paths = set()
+        soup = BeautifulSoup(etree.tostring(element), 'lxml')
+        for child in soup.findAll():
+            for _, val in child.attrs.items():
+                try:
+                    if val.startswith(STATIC_PREFIX):
+                        paths.add(val[len(STATIC_PREFIX):])
+                except AttributeError:
+                    continue  # not a string
+        references[resource_id] = paths
+    return references
+
+
+class Command(BaseCommand):
+    """
+    Compare the single pass scanner to per-resource BeautifulSoup parsing.
+    """
+    help = "Times static reference scanning on a synthetic course."
+
+    def add_arguments(self, parser):
+        """Add argparse arguments."""
+        parser.add_argument('--depth', type=int, default=4)
+        parser.add_argument('--width', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Run the benchmark."""
+        course = make_course(options["depth"], options["width"])
+        resources = resource_elements(course)
+
+        start = default_timer()
+        expected = soup_references(resources)
+        soup_time = default_timer() - start
+
+        start = default_timer()
+        found = find_static_references(course, resources)
+        scan_time = default_timer() - start
+
+        found = {
+            resource_id: found.get(resource_id, set())
+            for resource_id in expected
+        }
+        if found != expected:
+            raise CommandError("Scanner results differ from BeautifulSoup")
+
+        self.stdout.write(
+            "{count} resources: BeautifulSoup {soup:.3f}s, "
+            "single pass {scan:.3f}s ({ratio:.1f}x)".format(
+                count=len(resources),
+                soup=soup_time,
+                scan=scan_time,
+                ratio=soup_time / max(scan_time, 1e-9),
+            )
+        )
@@ -0,0 +1,114 @@
+"""
+Progress reporting for course imports.
+"""
+
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+from threading import Lock
+import time
+
+from celery import current_task
+from statsd.defaults.django import statsd
+
+# Celery state of an import task which has published progress
+PROGRESS_STATE = "PROGRESS"
+# Least seconds between publishing changes to the counters
+PUBLISH_INTERVAL = 1
+
+
+class ImportProgress(object):
+    """
+    Track how far a course import has got.
+
+    The progress is published as the meta of the running Celery task, if
+    there is one, and each phase is timed with statsd as
+    ``lore.import.<phase>``. Counters are published at most every
+    PUBLISH_INTERVAL seconds, and when a phase starts or ends.
+    """
+
+    def __init__(self, root=""):
+        """
+        Args:
+            root (unicode): Course directory within the archive
+        """
+        self._lock = Lock()
+        # When the meta was last published, and whether it changed since
+        self._published_at = None
+        self._changed = False
+        self.meta = {
+            "root": root,
+            "phase": None,
+            "elements_processed": 0,
+            "elements_total": 0,
+            "assets_uploaded": 0,
+            "assets_total": 0,
+            "index_chunks_done": 0,
+            "index_chunks_total": 0,
+        }
+
+    def update(self, **changes):
+        """
+        Change the progress and publish it.
+
+        Args:
+            **changes: Values to replace in the meta.
+        """
+        with self._lock:
+            self.meta.update(changes)
+            meta = self._published()
+        self._publish(meta)
+
+    def advance(self, key, count=1):
+        """
+        Add to a counter, publishing the progress if it hasn't been for
+        PUBLISH_INTERVAL seconds.
+
+        Args:
+            key (unicode): Name of the counter in the meta.
+            count (int): Amount to add.
+        """
+        with self._lock:
+            self.meta[key] += count
+            if (
+                    self._published_at is not None and
+                    time.time() - self._published_at < PUBLISH_INTERVAL
+            ):
+                self._changed = True
+                return
+            meta = self._published()
+        self._publish(meta)
+
+    def _flush(self):
+        """Publish the progress if it changed since it was last published."""
+        with self._lock:
+            if not self._changed:
+                return
+            meta = self._published()
+        self._publish(meta)
+
+    def _published(self):
+        """Note that the meta is being published, and return a copy."""
+        self._published_at = time.time()
+        self._changed = False
+        return dict(self.meta)
+
+    @staticmethod
+    def _publish(meta):
+        """Store the meta on the running task, if any."""
+        task = current_task
+        if task is not None and task.request.id is not None:
+            task.update_state(state=PROGRESS_STATE, meta=meta)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Publish and time a phase of the import.
+
+        Args:
+            name (unicode): Phase name.
+        """
+        self.update(phase=name)
+        with statsd.timer("lore.import.{phase}".format(phase=name)):
+            yield
+        self._flush()
@@ -6,7 +6,10 @@ from __future__ import unicode_literals
 import json
 import logging
 
+from celery import chord
+from celery.utils import uuid
 from django.conf import settings
+from django.core.files.storage import default_storage
 import requests
 from statsd.defaults.django import statsd
 
@@ -21,10 +24,101 @@ RETRY_LIMIT = 10
 
 @async.task
 @statsd.timer('lore.import_file')
-def import_file(path, repo_id, user_id):
-    """Asynchronously import a course."""
-    from importer.api import import_course_from_file
-    import_course_from_file(path, repo_id, user_id)
+def import_file(path, repo_id, user_id, incremental=False):
+    """
+    Asynchronously import the courses in an archive.
+
+    Each course is imported by its own subtask, so the courses in an
+    archive are imported in parallel. An archive holding several courses
+    is split first so each subtask only downloads its own course. The
+    subtasks are gathered in a chord which deletes the archives once they
+    have all finished.
+
+    Args:
+        path (unicode): Path to archive file in default_storage
+        repo_id (int): Primary key of repository courses belong to
+        user_id (int): Primary key of user importing the courses
+        incremental (bool): Update courses which were imported before
+    Returns:
+        dict: The result of finish_import if the courses were imported
+            already, otherwise the chord id and per-course task ids.
+    Raises:
+        ValueError: Unable to read archive or no courses found.
+    """
+    from importer.api import split_course_archive
+    try:
+        course_paths = split_course_archive(path)
+    except ValueError:
+        default_storage.delete(path)
+        raise
+
+    courses = [
+        {"root": root, "task_id": uuid(), "status": "processing"}
+        for root, _ in course_paths
+    ]
+    split_paths = [
+        course_path for _, course_path in course_paths if course_path != path
+    ]
+    result = chord([
+        import_course_root.si(
+            course_path, course["root"], repo_id, user_id, incremental
+        ).set(task_id=course["task_id"])
+        for course, (_, course_path) in zip(courses, course_paths)
+    ])(finish_import.s(path, split_paths))
+    if result.ready():
+        return result.get()
+    return {"chord_id": result.id, "courses": courses}
+
+
+@async.task
+@statsd.timer('lore.import_course')
+def import_course_root(path, root, repo_id, user_id, incremental=False):
+    """
+    Import one course from an archive.
+
+    Errors are returned rather than raised so that one bad course doesn't
+    stop the chord in import_file from finishing.
+
+    Args:
+        path (unicode): Path to archive file in default_storage
+        root (unicode): Course directory within the archive
+        repo_id (int): Primary key of repository course belongs to
+        user_id (int): Primary key of user importing the course
+        incremental (bool): Update the course if it was imported before
+    Returns:
+        dict: Course directory, status and either course id or error.
+    """
+    from importer.api import import_course_from_archive, open_course_archive
+    try:
+        archive = open_course_archive(path)
+        try:
+            course = import_course_from_archive(
+                archive, root, repo_id, user_id, incremental)
+        finally:
+            archive.close()
+    except Exception as ex:  # pylint: disable=broad-except
+        log.exception("Unable to import course %s from %s", root, path)
+        return {"root": root, "status": "failure", "error": str(ex)}
+    return {"root": root, "status": "success", "course_id": course.id}
+
+
+@async.task
+def finish_import(results, path, course_paths=()):
+    """
+    Delete an archive once all of its courses have been imported.
+
+    Args:
+        results (list): Return values of import_course_root
+        path (unicode): Path to archive file in default_storage
+        course_paths (list): Paths of the per-course archives split
+            from it
+    Returns:
+        dict: The per-course results.
+    """
+    default_storage.delete(path)
+    for course_path in course_paths:
+        default_storage.delete(course_path)
+    return {"courses": results}
 
 
 @async.task
@@ -5,8 +5,11 @@ Tests for LORE imports.
 from __future__ import unicode_literals
 
 from collections import namedtuple
+from hashlib import sha256
+from io import BytesIO
 import os
 from shutil import rmtree
+import tarfile
 from tempfile import mkstemp, mkdtemp
 import zipfile
 import logging
@@ -16,24 +19,34 @@ from django.core.files.base import ContentFile
 import mock
 from lxml import etree
 
-from xbundle import XBundle
+from xbundle import XBundle, DESCRIPTOR_TAGS
+from importer.archives import CourseArchive
 from importer.api import (
     import_course_from_file,
     import_course_from_path,
-    import_static_assets,
     import_course,
 )
 from importer.tasks import import_file
-from learningresources.api import get_resources, create_repo
+from learningresources.api import (
+    create_course,
+    create_repo,
+    get_resources,
+    get_static_asset_index,
+    import_static_assets,
+    list_static_files,
+    update_static_assets,
+)
 from learningresources.models import (
     Course,
     StaticAsset,
     static_asset_basepath,
+    static_asset_blobpath,
     LearningResource,
     get_preview_url,
 )
 from learningresources.tests.base import LoreTestCase
 from lore import settings
+from search.utils import strip_xml
 
 log = logging.getLogger(__name__)
 
@@ -134,6 +147,67 @@ class TestImportToy(LoreTestCase):
             original_count + 1,
         )
 
+    def test_import_task_multiple(self):
+        """
+        Each course in an archive is imported by its own subtask.
+        """
+        original_count = Course.objects.count()
+        zip_file = self.get_course_multiple_zip()
+        result = import_file(zip_file, self.repo.id, self.user.id)
+        self.assertEqual(
+            Course.objects.count(),
+            original_count + 2,
+        )
+        self.assertFalse(os.path.exists(zip_file))
+        self.assertEqual(
+            sorted(course["status"] for course in result["courses"]),
+            ["success", "success"]
+        )
+        self.assertEqual(
+            sorted(course["course_id"] for course in result["courses"]),
+            sorted(
+                Course.objects.exclude(
+                    id=self.course.id).values_list("id", flat=True)
+            )
+        )
+
+    def test_import_task_split(self):
+        """
+        Each subtask reads its own course's archive, and those archives
+        are deleted when the import finishes.
+        """
+        from importer import api
+        zip_file = self.get_course_multiple_zip()
+        with mock.patch(
+            'importer.api.open_course_archive',
+            side_effect=api.open_course_archive
+        ) as mock_open:
+            import_file(zip_file, self.repo.id, self.user.id)
+        opened = [args[0] for args, _ in mock_open.call_args_list]
+        self.assertEqual(opened[0], zip_file)
+        self.assertEqual(
+            sorted(opened[1:]),
+            [zip_file + ".0.tar.gz", zip_file + ".1.tar.gz"]
+        )
+        for path in opened:
+            self.assertFalse(os.path.exists(path))
+
+    def test_import_task_failure(self):
+        """
+        A failed course is reported and the archive is still deleted.
+        """
+        zip_file = self.get_course_multiple_zip()
+        with mock.patch(
+            'importer.api.import_course_from_archive'
+        ) as mock_import:
+            mock_import.side_effect = ValueError("bad course")
+            result = import_file(zip_file, self.repo.id, self.user.id)
+        self.assertFalse(os.path.exists(zip_file))
+        self.assertEqual(len(result["courses"]), 2)
+        for course in result["courses"]:
+            self.assertEqual(course["status"], "failure")
+            self.assertEqual(course["error"], "bad course")
+
     @staticmethod
     def test_import_course_from_path():
         """
@@ -144,7 +218,7 @@ class TestImportToy(LoreTestCase):
         test_user_id = 42
         with mock.patch('importer.api.import_course') as mock_import:
             with mock.patch(
-                'importer.api.import_static_assets'
+                'importer.api.upload_static_assets'
             ):
                 with mock.patch('importer.api.XBundle') as mock_bundle:
                     mock_import.return_value = True
@@ -179,6 +253,221 @@ class TestImportToy(LoreTestCase):
         )
         self.addCleanup(default_storage.delete, asset.asset)
 
+    def test_import_static_assets_retry(self):
+        """
+        Verify failed uploads are retried, and reported if they never work
+        """
+        temp_dir_path = mkdtemp()
+        self.addCleanup(rmtree, temp_dir_path)
+        basename = 'blah.txt'
+        with open(os.path.join(temp_dir_path, basename), 'w') as temp:
+            temp.write('hello\n')
+        dummy = mock.MagicMock()
+        dummy.course = self.course
+        stored_name = static_asset_basepath(dummy, basename)
+
+        with mock.patch('learningresources.api.sleep'), mock.patch(
+            'learningresources.api.default_storage'
+        ) as storage:
+            storage.save.side_effect = [IOError('timed out'), stored_name]
+            failed = import_static_assets(self.course, temp_dir_path)
+        self.assertEqual(failed, [])
+        self.assertEqual(storage.save.call_count, 2)
+        assets = StaticAsset.objects.filter(course=self.course)
+        self.assertEqual(
+            [asset.asset.name for asset in assets], [stored_name])
+        assets.delete()
+
+        with self.settings(IMPORT_UPLOAD_RETRIES=2), mock.patch(
+            'learningresources.api.sleep'
+        ), mock.patch('learningresources.api.default_storage') as storage:
+            storage.save.side_effect = IOError('timed out')
+            failed = import_static_assets(self.course, temp_dir_path)
+        self.assertEqual(failed, [basename])
+        self.assertEqual(storage.save.call_count, 2)
+        self.assertFalse(
+            StaticAsset.objects.filter(course=self.course).exists())
+
+    def test_import_static_assets_dedup(self):
+        """
+        Verify identical assets are stored once when deduplicating
+        """
+        temp_dir_path = mkdtemp()
+        self.addCleanup(rmtree, temp_dir_path)
+        basename = 'blah.txt'
+        with open(os.path.join(temp_dir_path, basename), 'w') as temp:
+            temp.write('hello\n')
+        other_course = create_course(
+            org="test-org",
+            repo_id=self.repo.id,
+            course_number="infinity",
+            run="Marchtember",
+            user_id=self.user.id,
+        )
+
+        with self.settings(STATIC_ASSET_DEDUP=True):
+            import_static_assets(self.course, temp_dir_path)
+            with mock.patch(
+                'learningresources.api.default_storage.save'
+            ) as save:
+                import_static_assets(other_course, temp_dir_path)
+        self.assertFalse(save.called)
+
+        assets = StaticAsset.objects.filter(
+            course__in=[self.course, other_course])
+        self.assertEqual(assets.count(), 2)
+        self.assertEqual(
+            set(asset.asset.name for asset in assets),
+            {
+                static_asset_blobpath(
+                    sha256(b'hello\n').hexdigest(), basename)
+            }
+        )
+        self.addCleanup(default_storage.delete, assets[0].asset)
+        self.assertEqual(
+            list(get_static_asset_index(other_course).keys()), [basename])
+
+    def test_import_static_assets_dedup_race(self):
+        """
+        Verify an asset stored by a concurrent import between checking
+        for it and saving it keeps its content addressed name
+        """
+        temp_dir_path = mkdtemp()
+        self.addCleanup(rmtree, temp_dir_path)
+        basename = 'blah.txt'
+        with open(os.path.join(temp_dir_path, basename), 'w') as temp:
+            temp.write('hello\n')
+        other_course = create_course(
+            org="test-org",
+            repo_id=self.repo.id,
+            course_number="infinity",
+            run="Marchtember",
+            user_id=self.user.id,
+        )
+        blob_name = static_asset_blobpath(
+            sha256(b'hello\n').hexdigest(), basename)
+        renamed = blob_name.replace(basename, 'blah_a1b2c3d.txt')
+
+        with self.settings(STATIC_ASSET_DEDUP=True):
+            import_static_assets(self.course, temp_dir_path)
+            self.addCleanup(default_storage.delete, blob_name)
+            # The other import checked before the first one saved.
+            with mock.patch(
+                'learningresources.api.default_storage'
+            ) as storage:
+                storage.exists.return_value = False
+                storage.save.return_value = renamed
+                import_static_assets(other_course, temp_dir_path)
+        storage.delete.assert_called_once_with(renamed)
+
+        asset = StaticAsset.objects.get(course=other_course)
+        self.assertEqual(asset.asset.name, blob_name)
+        self.assertEqual(
+            list(get_static_asset_index(other_course).keys()), [basename])
+
+    def test_update_static_assets_unchanged(self):
+        """
+        Verify re-imports compare assets by their recorded hash, without
+        downloading or uploading unchanged files
+        """
+        temp_dir_path = mkdtemp()
+        self.addCleanup(rmtree, temp_dir_path)
+        basename = 'blah.txt'
+        with open(os.path.join(temp_dir_path, basename), 'w') as temp:
+            temp.write('hello\n')
+        import_static_assets(self.course, temp_dir_path)
+        asset = StaticAsset.objects.get(course=self.course)
+        self.addCleanup(default_storage.delete, asset.asset)
+        self.assertEqual(asset.content_hash, sha256(b'hello\n').hexdigest())
+
+        with mock.patch(
+            'learningresources.api.default_storage'
+        ) as storage:
+            failed = update_static_assets(
+                self.course, list_static_files(temp_dir_path))
+        self.assertEqual(failed, [])
+        self.assertFalse(storage.open.called)
+        self.assertFalse(storage.save.called)
+        self.assertFalse(storage.delete.called)
+        self.assertEqual(
+            list(StaticAsset.objects.filter(course=self.course)), [asset])
+
+    def test_update_static_assets_deferred_delete(self):
+        """
+        Verify changed files are uploaded over the stored ones, and files
+        removed by a re-import are left in storage for the caller to delete
+        """
+        temp_dir_path = mkdtemp()
+        self.addCleanup(rmtree, temp_dir_path)
+        changed_path = os.path.join(temp_dir_path, 'blah.txt')
+        removed_path = os.path.join(temp_dir_path, 'gone.txt')
+        for path in (changed_path, removed_path):
+            with open(path, 'w') as temp:
+                temp.write('hello\n')
+        import_static_assets(self.course, temp_dir_path)
+        names = dict(
+            (os.path.basename(asset.asset.name), asset.asset.name)
+            for asset in StaticAsset.objects.filter(course=self.course)
+        )
+        for name in names.values():
+            self.addCleanup(default_storage.delete, name)
+
+        with open(changed_path, 'w') as temp:
+            temp.write('goodbye\n')
+        os.remove(removed_path)
+        deleted_files = []
+        failed = update_static_assets(
+            self.course, list_static_files(temp_dir_path),
+            deleted_files=deleted_files
+        )
+        self.assertEqual(failed, [])
+        self.assertEqual(deleted_files, [names['gone.txt']])
+        self.assertTrue(default_storage.exists(names['gone.txt']))
+
+        asset = StaticAsset.objects.get(course=self.course)
+        self.assertEqual(asset.asset.name, names['blah.txt'])
+        self.assertEqual(asset.content_hash, sha256(b'goodbye\n').hexdigest())
+        with default_storage.open(asset.asset.name) as stored:
+            self.assertEqual(stored.read(), b'goodbye\n')
+        self.assertEqual(
+            get_static_asset_index(self.course), {'blah.txt': asset.id})
+
+    def test_update_static_assets_read_once(self):
+        """
+        Verify re-imports read each file once, whether it's unchanged,
+        changed or new
+        """
+        temp_dir_path = mkdtemp()
+        self.addCleanup(rmtree, temp_dir_path)
+        for basename in ('same.txt', 'changed.txt'):
+            with open(os.path.join(temp_dir_path, basename), 'w') as temp:
+                temp.write('hello\n')
+        import_static_assets(self.course, temp_dir_path)
+        for asset in StaticAsset.objects.filter(course=self.course):
+            self.addCleanup(default_storage.delete, asset.asset.name)
+
+        with open(os.path.join(temp_dir_path, 'changed.txt'), 'w') as temp:
+            temp.write('goodbye\n')
+        with open(os.path.join(temp_dir_path, 'new.txt'), 'w') as temp:
+            temp.write('new\n')
+        files = list_static_files(temp_dir_path)
+        openers = dict(
+            (name, mock.Mock(side_effect=opener)) for name, opener in files
+        )
+        on_upload = mock.Mock()
+        failed = update_static_assets(
+            self.course, sorted(openers.items()), on_upload=on_upload)
+        self.assertEqual(failed, [])
+        for opener in openers.values():
+            self.assertEqual(opener.call_count, 1)
+        self.assertEqual(on_upload.call_count, 3)
+        for asset in StaticAsset.objects.filter(course=self.course):
+            self.addCleanup(default_storage.delete, asset.asset.name)
+        self.assertEqual(
+            sorted(get_static_asset_index(self.course).keys()),
+            ['changed.txt', 'new.txt', 'same.txt']
+        )
+
     def test_import_static_recurse(self):
         """
         Verify walking a folder of assets and verifying they get added
@@ -239,6 +528,59 @@ class TestImportToy(LoreTestCase):
                 ]
             )
 
+    def test_static_not_extracted(self):
+        """
+        Static files are uploaded from the archive, only XML is extracted.
+        """
+        extract_dir = mkdtemp()
+        self.addCleanup(rmtree, extract_dir)
+        with mock.patch('importer.api.mkdtemp', return_value=extract_dir):
+            with mock.patch('importer.api.rmtree'):
+                import_course_from_file(
+                    self.get_course_single_tarball(),
+                    self.repo.id, self.user.id
+                )
+        self.assertTrue(
+            os.path.exists(os.path.join(extract_dir, 'course.xml')))
+        self.assertFalse(os.path.exists(os.path.join(extract_dir, 'static')))
+        course = Course.objects.exclude(id=self.course.id).get()
+        self.assertEqual(
+            sorted(get_static_asset_index(course).keys()),
+            sorted([
+                'test.txt', 'subdir/subtext.txt',
+                'subs_CCxmtcICYNc.srt.sjson',
+                'essays_x250.png', 'webGLDemo.css',
+            ])
+        )
+
+    def test_static_read_in_archive_order(self):
+        """
+        Static files are read from a compressed tar in archive order, even
+        when they are asked for out of order.
+        """
+        names = ["static/{0}.txt".format(letter) for letter in "dbeac"]
+        handle = BytesIO()
+        with tarfile.open(fileobj=handle, mode="w:gz") as tar:
+            for name in ["course.xml"] + names:
+                contents = name.encode("utf-8")
+                info = tarfile.TarInfo(name)
+                info.size = len(contents)
+                tar.addfile(info, BytesIO(contents))
+        handle.seek(0)
+
+        archive = CourseArchive(handle)
+        self.addCleanup(archive.close)
+        openers = dict(archive.static_files(""))
+        with mock.patch.object(
+            CourseArchive, '_open_member', autospec=True,
+            side_effect=CourseArchive._open_member
+        ) as open_member:
+            for name in reversed(names):
+                opened = openers[name[len("static/"):]]()
+                self.assertEqual(opened.read(), name.encode("utf-8"))
+        self.assertEqual(
+            [call[0][1] for call in open_member.call_args_list], names)
+
     def test_parse_static(self):
         """
         Parse the static assets in the sample course
@@ -365,6 +707,145 @@ class TestImportToy(LoreTestCase):
             )
         )
 
+    def test_reimport_incremental(self):
+        """
+        Re-importing a course only writes and reindexes what changed.
+        """
+        template = """
+<course org="DevOps" course="0.001" semester="2015_Summer"
+    url_name="2015_Summer">
+  <chapter url_name="c1" display_name="Week 1">
+    <sequential url_name="s1" display_name="Lesson">
+      <vertical url_name="v1">
+        {first}
+        <html url_name="h2">two</html>
+        <problem url_name="p1">{problem}</problem>
+        {last}
+      </vertical>
+    </sequential>
+  </chapter>
+  <chapter url_name="c2" display_name="Week 2">
+    <html url_name="h4">four</html>
+  </chapter>
+</course>
+"""
+        repo = create_repo("reimport_repo", "...", self.user.id)
+
+        def import_xml(incremental=False, **kwargs):
+            """Import the course from the template."""
+            bundle = XBundle(
+                keep_urls=True, keep_studio_urls=True, preserve_url_name=True
+            )
+            bundle.set_course(etree.fromstring(template.format(**kwargs)))
+            return import_course(
+                bundle, repo.id, self.user.id, "", incremental=incremental)
+
+        def resource_ids():
+            """Get resource ids by url_name."""
+            return dict(LearningResource.objects.filter(
+                course__repository__id=repo.id
+            ).values_list("url_name", "id"))
+
+        course = import_xml(
+            first='<html url_name="h1">one</html>', problem="three", last='')
+        before = resource_ids()
+
+        with self.assertRaises(ValueError):
+            import_xml(first='', problem="3", last='')
+
+        with mock.patch('importer.api.index_resources') as mock_index:
+            self.assertEqual(
+                import_xml(
+                    incremental=True, first='', problem="3",
+                    last='<html url_name="h3">new</html>',
+                ),
+                course
+            )
+        after = resource_ids()
+
+        self.assertNotIn("h1", after)
+        for url_name in ("2015_Summer", "c1", "s1", "v1", "h2", "p1", "c2",
+                         "h4"):
+            self.assertEqual(before[url_name], after[url_name])
+        # Ancestors of changed resources change too, since their XML
+        # contains their descendants'.
+        self.assertEqual(
+            sorted(mock_index.call_args[0][0]),
+            sorted(
+                after[url_name] for url_name in
+                ("2015_Summer", "c1", "s1", "v1", "h2", "p1", "h3")
+            )
+        )
+        moved = LearningResource.objects.get(id=after["h2"])
+        self.assertEqual(
+            moved.materialized_path,
+            "/course/chapter[1]/sequential/vertical/html[1]"
+        )
+        self.assertEqual(
+            LearningResource.objects.get(id=after["h3"]).parent_id,
+            after["v1"]
+        )
+        self.assertIn(
+            "3", LearningResource.objects.get(id=after["p1"]).content_xml)
+        for resource in LearningResource.objects.filter(
+                course__repository__id=repo.id):
+            # Text is stored for search, and updated with the XML.
+            self.assertEqual(
+                resource.content_stripped, strip_xml(resource.content_xml))
+        self.assertEqual(
+            LearningResource.objects.get(id=after["p1"]).content_stripped,
+            "3"
+        )
+
+    def test_reimport_inserted_sibling(self):
+        """
+        Re-importing a course with a sibling inserted before existing ones
+        keeps each resource matched to its own element.
+        """
+        template = """
+<course org="DevOps" course="0.001" semester="2015_Summer"
+    url_name="2015_Summer">
+  <chapter url_name="c1" display_name="Week 1">
+    {first}
+    <html url_name="h1">one</html>
+    <html url_name="h2">two</html>
+  </chapter>
+</course>
+"""
+        repo = create_repo("insert_repo", "...", self.user.id)
+
+        def import_xml(incremental=False, first=''):
+            """Import the course from the template."""
+            bundle = XBundle(
+                keep_urls=True, keep_studio_urls=True, preserve_url_name=True
+            )
+            bundle.set_course(etree.fromstring(template.format(first=first)))
+            return import_course(
+                bundle, repo.id, self.user.id, "", incremental=incremental)
+
+        def resource_ids():
+            """Get resource ids by url_name."""
+            return dict(LearningResource.objects.filter(
+                course__repository__id=repo.id
+            ).values_list("url_name", "id"))
+
+        import_xml()
+        before = resource_ids()
+        with mock.patch('importer.api.index_resources'):
+            import_xml(
+                incremental=True, first='<html url_name="hX">new</html>')
+        after = resource_ids()
+
+        for url_name in ("2015_Summer", "c1", "h1", "h2"):
+            self.assertEqual(before[url_name], after[url_name])
+        self.assertNotIn(after["hX"], before.values())
+        self.assertIn(
+            "one", LearningResource.objects.get(id=after["h1"]).content_xml)
+        self.assertEqual(
+            LearningResource.objects.get(id=after["h2"]).materialized_path,
+            "/course/chapter/html[3]"
+        )
+
     def test_missing_preview_link(self):
         """
         Test that if url_name is blank we try importing each parent
@@ -440,3 +921,95 @@ class TestImportToy(LoreTestCase):
                 ).count(),
                 1
             )
+
+    def test_import_hierarchy(self):
+        """
+        Test that bulk inserted resources keep their parents, paths and
+        static asset links regardless of the batch size.
+        """
+        xml = """
+<course org="DevOps" course="0.001" url_name="2015_Summer"
+    semester="2015_Summer">
+  <chapter display_name="Week 1">
+    <sequential display_name="Lesson">
+      <vertical>
+        <html display_name="Intro"></html>
+        <problem display_name="Quiz"></problem>
+      </vertical>
+    </sequential>
+  </chapter>
+  <chapter display_name="Week 2"/>
+</course>
+"""
+        for batch_size in (1, 500):
+            repo = create_repo(
+                "batch_{size}".format(size=batch_size), "...", self.user.id)
+            bundle = XBundle(
+                keep_urls=True, keep_studio_urls=True, preserve_url_name=True
+            )
+            bundle.set_course(etree.fromstring(xml))
+            with self.settings(IMPORT_BATCH_SIZE=batch_size):
+                course = import_course(bundle, repo.id, self.user.id, "")
+
+            resources = LearningResource.objects.filter(course=course)
+            self.assertEqual(resources.count(), 7)
+            problem = resources.get(learning_resource_type__name="problem")
+            self.assertEqual(
+                problem.description_path, "... / Week 1 / Lesson / ... / Quiz"
+            )
+            ancestors = []
+            current = problem.parent
+            while current is not None:
+                ancestors.append(current.learning_resource_type.name)
+                current = current.parent
+            self.assertEqual(
+                ancestors, ["vertical", "sequential", "chapter", "course"])
+
+    def test_materialized_paths(self):
+        """
+        Test that materialized paths match lxml's getpath.
+        """
+        xml = """
+<course org="DevOps" course="0.001" url_name="2015_Summer"
+    semester="2015_Summer">
+  <chapter>
+    <!-- comments aren't counted -->
+    <sequential>
+      <vertical>
+        <html></html>
+        <problem></problem>
+        <p>not a resource</p>
+        <html></html>
+      </vertical>
+      <vertical>
+        <problem><problem></problem></problem>
+      </vertical>
+    </sequential>
+  </chapter>
+  <chapter/>
+  <html/>
+</course>
+"""
+        repo = create_repo("paths", "...", self.user.id)
+        root = etree.fromstring(xml)
+        bundle = XBundle(
+            keep_urls=True, keep_studio_urls=True, preserve_url_name=True
+        )
+        bundle.set_course(root)
+        course = import_course(bundle, repo.id, self.user.id, "")
+
+        tree = etree.ElementTree(bundle.course)
+        expected = sorted(
+            tree.getpath(element) for element in bundle.course.iter(
+                *DESCRIPTOR_TAGS)
+            # The nested problem isn't a resource.
+            if element.getparent() is None or
+            element.getparent().tag != "problem"
+        )
+        self.assertEqual(
+            sorted(LearningResource.objects.filter(
+                course=course).values_list("materialized_path", flat=True)),
+            expected
+        )
+        self.assertIn(
+            "/course/chapter[1]/sequential/vertical[1]/html[2]", expected)
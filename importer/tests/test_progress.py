@@ -0,0 +1,98 @@
+"""
+Tests for import progress reporting.
+"""
+
+from __future__ import unicode_literals
+
+import mock
+
+from importer.api import import_course_from_file
+from importer.progress import (
+    ImportProgress,
+    PROGRESS_STATE,
+    PUBLISH_INTERVAL,
+)
+from learningresources.tests.base import LoreTestCase
+
+
+class TestImportProgress(LoreTestCase):
+    """
+    Test that imports publish their progress.
+    """
+
+    def test_no_task(self):
+        """
+        Progress is tracked without publishing outside of a task.
+        """
+        progress = ImportProgress("course")
+        with mock.patch('importer.progress.current_task', None):
+            with progress.phase("extract"):
+                progress.advance("elements_processed", 3)
+        self.assertEqual(progress.meta["root"], "course")
+        self.assertEqual(progress.meta["phase"], "extract")
+        self.assertEqual(progress.meta["elements_processed"], 3)
+
+    def test_throttle(self):
+        """
+        Counters are published at most once per interval, and once more
+        when the phase ends.
+        """
+        task = mock.Mock()
+        task.request.id = "task-id"
+        progress = ImportProgress("course")
+        with mock.patch('importer.progress.current_task', task):
+            with mock.patch('importer.progress.time') as mock_time:
+                mock_time.time.return_value = 100
+                with progress.phase("resources"):
+                    for _ in range(10):
+                        progress.advance("elements_processed")
+                    # Still publishing the phase start.
+                    self.assertEqual(task.update_state.call_count, 1)
+                    mock_time.time.return_value = 100 + PUBLISH_INTERVAL
+                    progress.advance("elements_processed")
+                    self.assertEqual(task.update_state.call_count, 2)
+                    progress.advance("elements_processed")
+                    self.assertEqual(task.update_state.call_count, 2)
+
+        self.assertEqual(task.update_state.call_count, 3)
+        _, kwargs = task.update_state.call_args
+        self.assertEqual(kwargs["meta"]["elements_processed"], 12)
+
+    def test_import_progress(self):
+        """
+        Importing a course publishes every phase and counter.
+        """
+        task = mock.Mock()
+        task.request.id = "task-id"
+        with mock.patch('importer.progress.current_task', task):
+            with mock.patch('importer.progress.statsd') as mock_statsd:
+                import_course_from_file(
+                    self.get_course_single_tarball(),
+                    self.repo.id, self.user.id
+                )
+
+        calls = task.update_state.call_args_list
+        for _, kwargs in calls:
+            self.assertEqual(kwargs["state"], PROGRESS_STATE)
+        metas = [kwargs["meta"] for _, kwargs in calls]
+
+        phases = []
+        for meta in metas:
+            if meta["phase"] not in phases:
+                phases.append(meta["phase"])
+        self.assertEqual(phases, [
+            "extract", "parse", "static_upload", "resources",
+            "asset_linking", "indexing",
+        ])
+        self.assertEqual(
+            [args[0] for args, _ in mock_statsd.timer.call_args_list],
+            ["lore.import.{phase}".format(phase=phase) for phase in phases]
+        )
+
+        final = metas[-1]
+        self.assertEqual(final["elements_total"], self.toy_resource_count)
+        self.assertEqual(final["elements_processed"], self.toy_resource_count)
+        self.assertEqual(final["assets_total"], self.toy_asset_count)
+        self.assertEqual(final["assets_uploaded"], self.toy_asset_count)
+        self.assertEqual(final["index_chunks_total"], 1)
+        self.assertEqual(final["index_chunks_done"], 1)
@@ -0,0 +1,87 @@
+"""
+Tests for finding static asset references in course XML.
+"""
+
+from __future__ import unicode_literals
+
+from unittest import TestCase
+
+from django.core.management import call_command
+from lxml import etree
+from six import StringIO
+
+from importer.api import find_static_references
+from importer.management.commands.benchmark_static_references import (
+    make_course,
+    resource_elements,
+    soup_references,
+)
+
+COURSE_XML = """
+<course>
+  <chapter>
+    <html>
+      <img src="/static/inner.png"/>
+      <problem><img src="/static/nested.png"/></problem>
+      <div class="/static/not_a_link"/>
+      <a href="/static/handout.pdf" rel="/static/not_a_link"/>
+    </html>
+    <video sub="abc" src="/static/video.mp4">
+      <source src="/static/source.mp4"/>
+    </video>
+  </chapter>
+  <!-- <img src="/static/comment.png"/> -->
+</course>
+"""
+
+
+class TestStaticReferences(TestCase):
+    """
+    Test the single pass static reference scanner.
+    """
+
+    def test_references(self):
+        """
+        References belong to every enclosing resource except videos.
+        """
+        course = etree.fromstring(COURSE_XML)
+        chapter = course.find("chapter")
+        html = chapter.find("html")
+        video = chapter.find("video")
+        resources = {course: 1, chapter: 2, html: 3, video: 4}
+        html_paths = {"inner.png", "nested.png", "handout.pdf"}
+        video_paths = {"video.mp4", "source.mp4"}
+        self.assertEqual(
+            find_static_references(course, resources),
+            {
+                1: html_paths | video_paths,
+                2: html_paths | video_paths,
+                3: html_paths,
+            }
+        )
+
+    def test_matches_beautifulsoup(self):
+        """
+        The scanner should find what parsing each resource did.
+        """
+        course = etree.fromstring(COURSE_XML)
+        course.extend(make_course(3, 2).getchildren())
+        resources = resource_elements(course)
+        expected = soup_references(resources)
+        found = find_static_references(course, resources)
+        self.assertEqual(
+            {
+                resource_id: found.get(resource_id, set())
+                for resource_id in expected
+            },
+            expected
+        )
+
+    def test_benchmark_command(self):
+        """
+        The benchmark command should verify results and report timings.
+        """
+        out = StringIO()
+        call_command(
+            "benchmark_static_references", depth=2, width=2, stdout=out)
+        self.assertIn("single pass", out.getvalue())
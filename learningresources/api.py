@@ -5,23 +5,44 @@ apps don't tie functionality to internal implementation.
 
 from __future__ import unicode_literals
 
+from functools import partial
+from hashlib import sha256
 import logging
+from multiprocessing.pool import ThreadPool
 from os import walk, sep
 from os.path import join
+from time import sleep
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.files import File
+from django.core.files.storage import default_storage
 from django.db import transaction
 
 from guardian.shortcuts import get_objects_for_user, get_perms
 
 from learningresources.models import (
-    Course, Repository, LearningResource, LearningResourceType, StaticAsset
+    Course,
+    Repository,
+    LearningResource,
+    LearningResourceType,
+    StaticAsset,
+    FILE_PATH_MAX_LENGTH,
+    FilePathLengthException,
+    course_asset_basepath,
+    static_asset_blobpath,
+    static_asset_is_blob,
+    static_asset_relative_path,
 )
 from roles.permissions import RepoPermission
 
 log = logging.getLogger(__name__)
 
+# Seconds to wait before retrying a failed upload, multiplied by the attempt
+UPLOAD_RETRY_DELAY = 0.5
+# Bytes read at a time when hashing static assets
+HASH_CHUNK_SIZE = 64 * 1024
+
 
 class LearningResourceException(Exception):
     """Base class for our custom exceptions."""
@@ -259,6 +280,23 @@ def create_static_asset(course_id, handle):
         return StaticAsset.objects.create(course_id=course_id, asset=handle)
 
 
+def get_static_asset_index(course):
+    """
+    Map the paths of a course's static assets to their primary keys.
+
+    Args:
+        course (learningresources.models.Course): Course
+    Returns:
+        dict: StaticAsset ids keyed by path relative to the course's
+            ``static`` directory.
+    """
+    return {
+        static_asset_relative_path(course, name, content_hash): asset_id
+        for asset_id, name, content_hash in StaticAsset.objects.filter(
+            course__id=course.id).values_list("id", "asset", "content_hash")
+    }
+
+
 def _subs_filename(subs_id, lang='en'):
     """
     Generate proper filename for storage.
@@ -304,16 +342,301 @@ def import_static_assets(course, path):
         course (learningresources.models.Course): Course to add assets to.
         path (unicode): course specific path to extracted OLX tree.
     Returns:
-        None
+        list: Names of files which could not be uploaded.
+    """
+    return upload_static_assets(course, list_static_files(path))
+
+
+def list_static_files(path):
+    """
+    List the files below a static directory.
+
+    Args:
+        path (unicode): course specific path to extracted OLX tree.
+    Returns:
+        list: (name, opener) tuples as expected by upload_static_assets.
+    """
+    files = []
+    for root, _, names in walk(path):
+        for name in names:
+            file_path = join(root, name)
+            # Remove base path from file name
+            files.append((
+                file_path.replace(path + sep, '', 1),
+                partial(open, file_path, 'rb'),
+            ))
+    return files
+
+
+def update_static_assets(course, files, on_upload=None, deleted_files=None):
     """
-    for root, _, files in walk(path):
-        for name in files:
-            with open(join(root, name), 'rb') as open_file:
-                django_file = File(open_file)
-                # Remove base path from file name
-                name = join(root, name).replace(path + sep, '', 1)
-                django_file.name = name
-                create_static_asset(course.id, django_file)
+    Bring a course's static assets in line with a new set of files.
+
+    Files whose contents match the existing asset at the same path are
+    left alone. New and changed files are uploaded and assets which are
+    no longer present are deleted. Each file is read once, and hashed as
+    it is uploaded.
+
+    Args:
+        course (learningresources.models.Course): Course to update.
+        files (iterable): (name, opener) tuples as expected by
+            upload_static_assets.
+        on_upload (callable): Called with no arguments as each file
+            finishes uploading or is found unchanged.
+        deleted_files (list): If given, the names of stored files which
+            are no longer used are added to it instead of being deleted,
+            so the caller can delete them once its transaction commits.
+    Returns:
+        list: Names of files which could not be uploaded.
+    Raises:
+        FilePathLengthException: A storage path would be too long.
+    """
+    files = list(files)
+    _check_path_lengths(course, files)
+    existing = {
+        static_asset_relative_path(
+            course, asset.asset.name, asset.content_hash
+        ): asset
+        for asset in StaticAsset.objects.filter(course__id=course.id)
+    }
+    stored_files = {
+        name: (existing[name].asset.name, _stored_hash(existing[name]))
+        for name, _ in files if name in existing
+    }
+    uploads = _upload_files(course, files, on_upload, stored_files)
+
+    uploaded = []
+    stale = []
+    failed = []
+    for (name, _), upload in zip(files, uploads):
+        asset = existing.pop(name, None)
+        if asset is not None:
+            if upload == stored_files[name]:
+                continue
+            stale.append(asset)
+        if upload[0] is None:
+            failed.append(name)
+        else:
+            uploaded.append(upload)
+    stale.extend(existing.values())
+
+    StaticAsset.objects.filter(id__in=[asset.id for asset in stale]).delete()
+    _create_static_assets(course, uploaded)
+
+    # Changed files are usually uploaded over the stored ones, which must
+    # be kept. Content addressed files may be shared with other courses.
+    stored_names = set(StaticAsset.objects.filter(
+        course__id=course.id).values_list("asset", flat=True))
+    unused_files = [
+        asset.asset.name for asset in stale
+        if asset.asset.name not in stored_names and
+        not static_asset_is_blob(asset.asset.name)
+    ]
+    if deleted_files is None:
+        for name in unused_files:
+            default_storage.delete(name)
+    else:
+        deleted_files.extend(unused_files)
+    return failed
+
+
+def _stored_hash(asset):
+    """
+    Get the content hash of a StaticAsset. Assets uploaded before hashes
+    were recorded are hashed from storage once, and the hash is saved.
+
+    Args:
+        asset (learningresources.models.StaticAsset): Asset to hash.
+    Returns:
+        unicode: SHA-256 hex digest
+    """
+    if asset.content_hash:
+        return asset.content_hash
+    try:
+        with default_storage.open(asset.asset.name) as open_file:
+            content_hash = _hash_contents(open_file)
+    except (IOError, OSError):
+        return ''
+    StaticAsset.objects.filter(id=asset.id).update(content_hash=content_hash)
+    return content_hash
+
+
+def upload_static_assets(course, files, on_upload=None):
+    """
+    Upload files to storage in parallel and create StaticAssets for them.
+
+    Uploads run on a pool of ``settings.IMPORT_UPLOAD_WORKERS`` threads
+    and each is attempted up to ``settings.IMPORT_UPLOAD_RETRIES`` times.
+    Files which still fail are logged and left out, so one bad upload
+    doesn't lose the whole import. The StaticAsset rows are created with
+    a single bulk insert after the uploads finish.
+
+    If ``settings.STATIC_ASSET_DEDUP`` is set, contents are stored under
+    their SHA-256 hash instead of the course path, and files which are
+    already in storage are not uploaded again.
+
+    Args:
+        course (learningresources.models.Course): Course to add assets to.
+        files (iterable): (name, opener) tuples, where name is the path
+            relative to the static directory and opener returns a binary
+            file object for the contents.
+        on_upload (callable): Called with no arguments as each file
+            finishes uploading.
+    Returns:
+        list: Names of files which could not be uploaded.
+    Raises:
+        FilePathLengthException: A storage path would be too long.
+    """
+    files = list(files)
+    _check_path_lengths(course, files)
+    uploads = _upload_files(course, files, on_upload)
+    _create_static_assets(course, uploads)
+    return [
+        name for (name, _), (stored_name, _) in zip(files, uploads)
+        if stored_name is None
+    ]
+
+
+def _check_path_lengths(course, files):
+    """
+    Check every file can be stored before any are uploaded.
+
+    Args:
+        course (learningresources.models.Course): Course the files are for.
+        files (list): (name, opener) tuples
+    Raises:
+        FilePathLengthException: A storage path would be too long.
+    """
+    # Content hashes are 64 characters, which is what the course path
+    # has to fit in when assets are stored by hash.
+    longest_prefix = max(
+        len(course_asset_basepath(course, '')),
+        len(static_asset_blobpath('0' * 64, ''))
+        if settings.STATIC_ASSET_DEDUP else 0,
+    )
+    for name, _ in files:
+        if longest_prefix + len(name) > FILE_PATH_MAX_LENGTH:
+            raise FilePathLengthException(
+                'File path is more than {} characters long'.format(
+                    FILE_PATH_MAX_LENGTH
+                )
+            )
+
+
+def _upload_files(course, files, on_upload=None, stored_files=None):
+    """
+    Upload files on a pool of threads, in order.
+
+    Args:
+        course (learningresources.models.Course): Course the files are for.
+        files (list): (name, opener) tuples
+        on_upload (callable): Called with no arguments as each file is done.
+        stored_files (dict): (stored name, content hash) of files already
+            stored for the course, keyed by name. Files with the same
+            contents are not uploaded again.
+    Returns:
+        list: (stored name, content hash) for each file, as returned by
+            _upload_static_asset.
+    """
+    pool = ThreadPool(settings.IMPORT_UPLOAD_WORKERS)
+    uploads = []
+    try:
+        for upload in pool.imap(
+                partial(_upload_static_asset, course,
+                        stored_files=stored_files),
+                files
+        ):
+            uploads.append(upload)
+            if on_upload is not None:
+                on_upload()
+    finally:
+        pool.close()
+        pool.join()
+    return uploads
+
+
+def _create_static_assets(course, uploads):
+    """
+    Create StaticAssets for uploaded files with a single bulk insert.
+
+    Args:
+        course (learningresources.models.Course): Course to add assets to.
+        uploads (list): (stored name, content hash) tuples. Failed
+            uploads, with no stored name, are skipped.
+    """
+    StaticAsset.objects.bulk_create([
+        StaticAsset(
+            course_id=course.id, asset=stored_name, content_hash=content_hash
+        )
+        for stored_name, content_hash in uploads if stored_name is not None
+    ])
+
+
+def _hash_contents(open_file):
+    """
+    Hash a file's contents and rewind it.
+
+    Args:
+        open_file (file): Binary file object
+    Returns:
+        unicode: SHA-256 hex digest
+    """
+    digest = sha256()
+    for chunk in iter(partial(open_file.read, HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    open_file.seek(0)
+    return digest.hexdigest()
+
+
+def _upload_static_asset(course, name_and_opener, stored_files=None):
+    """
+    Save a static asset's contents to storage, retrying on errors.
+
+    Args:
+        course (learningresources.models.Course): Course the asset is for.
+        name_and_opener (tuple): Path relative to the static directory and
+            a callable returning a binary file object.
+        stored_files (dict): (stored name, content hash) of files already
+            stored for the course, keyed by name.
+    Returns:
+        tuple: Name of the file in storage, or None if it failed, and the
+            content hash. Unchanged files aren't saved, and their entry in
+            stored_files is returned.
+    """
+    name, opener = name_and_opener
+    stored = (stored_files or {}).get(name)
+    for attempt in range(1, settings.IMPORT_UPLOAD_RETRIES + 1):
+        try:
+            with opener() as open_file:
+                # Always recorded, so re-imports can compare contents
+                # without downloading the stored file.
+                content_hash = _hash_contents(open_file)
+                if stored is not None and stored[1] == content_hash:
+                    return stored
+                if not settings.STATIC_ASSET_DEDUP:
+                    return default_storage.save(
+                        course_asset_basepath(course, name), File(open_file)
+                    ), content_hash
+                blob_name = static_asset_blobpath(content_hash, name)
+                if default_storage.exists(blob_name):
+                    return blob_name, content_hash
+                stored_name = default_storage.save(blob_name, File(open_file))
+                if stored_name != blob_name:
+                    # Another import stored the same contents since we
+                    # checked, and storage renamed our copy. Theirs is
+                    # just as good, and the path is what links to it.
+                    default_storage.delete(stored_name)
+                return blob_name, content_hash
+        except Exception:  # pylint: disable=broad-except
+            log.warning(
+                "Attempt %d to upload static asset %s failed",
+                attempt, name, exc_info=True
+            )
+            if attempt < settings.IMPORT_UPLOAD_RETRIES:
+                sleep(UPLOAD_RETRY_DELAY * attempt)
+    log.error(
+        "Unable to upload static asset %s for course %s", name, course.id)
+    return None, ''
 
 
 def update_xanalytics(data):
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+# pylint: skip-file
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learningresources', '0018_fill_empty_slugs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='staticasset',
+            name='content_hash',
+            field=models.CharField(
+                max_length=64, blank=True, db_index=True, default=''
+            ),
+            preserve_default=False,
+        ),
+    ]
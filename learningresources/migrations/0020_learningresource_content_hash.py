@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+# pylint: skip-file
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learningresources', '0019_staticasset_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningresource',
+            name='content_hash',
+            field=models.CharField(max_length=64, blank=True, default=''),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+# pylint: skip-file
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learningresources', '0020_learningresource_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningresource',
+            name='content_stripped',
+            field=models.TextField(null=True, blank=True),
+        ),
+    ]
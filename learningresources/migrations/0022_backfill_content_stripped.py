@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Case, TextField, Value, When
+from lxml import etree
+
+# pylint: skip-file
+
+# Resources updated per query
+BATCH_SIZE = 500
+
+
+def _strip_xml(content):
+    """
+    Get the text of some XML, as search.utils.strip_xml did when this
+    migration was written.
+    """
+    if "<" not in content:
+        return content
+    try:
+        return etree.tostring(
+            etree.fromstring(content), encoding="utf-8", method="text",
+            with_tail=False
+        ).decode('utf-8')
+    except etree.XMLSyntaxError:
+        return content
+
+
+def backfill_content_stripped(apps, schema_editor):
+    """Store the text of resources imported before it was kept."""
+    LearningResource = apps.get_model("learningresources", "LearningResource")
+    missing = LearningResource.objects.filter(content_stripped__isnull=True)
+    while True:
+        batch = list(missing.order_by("id").values_list(
+            "id", "content_xml")[:BATCH_SIZE])
+        if len(batch) == 0:
+            return
+        LearningResource.objects.filter(
+            id__in=[resource_id for resource_id, _ in batch]
+        ).update(content_stripped=Case(
+            *[
+                When(id=resource_id, then=Value(_strip_xml(content_xml)))
+                for resource_id, content_xml in batch
+            ],
+            output_field=TextField()
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learningresources', '0021_learningresource_content_stripped'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_content_stripped, migrations.RunPython.noop)
+    ]
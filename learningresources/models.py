@@ -26,6 +26,7 @@ log = logging.getLogger(__name__)
 FILE_PATH_MAX_LENGTH = 900
 STATIC_ASSET_PREFIX = 'assets'
 STATIC_ASSET_BASEPATH = STATIC_ASSET_PREFIX + '/{org}/{course_number}/{run}/'
+STATIC_ASSET_BLOBPATH = STATIC_ASSET_PREFIX + '/blobs/{content_hash}/'
 
 
 class FilePathLengthException(Exception):
@@ -74,6 +75,59 @@ def course_asset_basepath(course, filename):
     )
 
 
+def static_asset_blobpath(content_hash, filename):
+    """
+    Returns the content addressed path for an asset's contents.
+
+    Assets with the same contents and filename share this path no matter
+    which course they were imported for.
+    Args:
+        content_hash (unicode): SHA-256 hex digest of the contents.
+        filename (unicode): The subpath and filename of the asset.
+    Returns:
+        (unicode): forward slash separated path to use below
+            ``settings.MEDIA_ROOT``.
+    """
+    return (STATIC_ASSET_BLOBPATH + '{filename}').format(
+        content_hash=content_hash,
+        filename=filename
+    )
+
+
+def static_asset_is_blob(name):
+    """
+    Returns whether an asset is stored under its content hash, in which
+    case other courses may share the file.
+
+    Args:
+        name (unicode): Name of the asset's file in storage.
+    Returns:
+        (bool): True if the file is content addressed.
+    """
+    return name.startswith(STATIC_ASSET_PREFIX + '/blobs/')
+
+
+def static_asset_relative_path(course, name, content_hash=''):
+    """
+    Returns the path of an asset within the course's static directory.
+
+    Args:
+        course (Course): The course the asset belongs to.
+        name (unicode): Name of the asset's file in storage.
+        content_hash (unicode): SHA-256 hex digest of the contents, if known.
+    Returns:
+        (unicode): The path relative to the static directory, or ``name``
+            if it is not a static asset path for the course.
+    """
+    prefixes = [course_asset_basepath(course, '')]
+    if content_hash:
+        prefixes.append(static_asset_blobpath(content_hash, ''))
+    for prefix in prefixes:
+        if name.startswith(prefix):
+            return name[len(prefix):]
+    return name
+
+
 class Course(BaseModel):
     """
     A course on edX platform (MITx or residential).
@@ -98,6 +152,8 @@ class StaticAsset(BaseModel):
         upload_to=static_asset_basepath,
         max_length=FILE_PATH_MAX_LENGTH
     )
+    # SHA-256 of the contents, recorded when the asset is uploaded
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
 
     def save(self, *args, **kwargs):
         """
@@ -125,6 +181,11 @@ class LearningResource(BaseModel):
     title = models.TextField()
     description = models.TextField(blank=True)
     content_xml = models.TextField()
+    # SHA-256 of content_xml, used to find changes when re-importing.
+    content_hash = models.CharField(max_length=64, blank=True)
+    # Text of content_xml without markup, as indexed for search. Null if it
+    # hasn't been worked out yet.
+    content_stripped = models.TextField(null=True, blank=True)
     materialized_path = models.TextField()
     description_path = models.TextField(blank=True)
     url_path = models.TextField()
@@ -188,6 +188,20 @@ class TestStaticAsset(LoreTestCase):
                 asset = api.create_static_asset(self.course.id, test_file)
         self.assertEqual(file_contents, asset.asset.read())
 
+    def test_get_static_asset_index(self):
+        """
+        Validate that asset ids are keyed by their path within the course.
+        """
+        self.assertEqual(api.get_static_asset_index(self.course), {})
+        with tempfile.TemporaryFile() as temp:
+            temp.write(b'hello\n')
+            asset = api.create_static_asset(
+                self.course.id, File(temp, name='subdir/blah.txt'))
+            self.addCleanup(default_storage.delete, asset.asset)
+        with self.assertNumQueries(1):
+            index = api.get_static_asset_index(self.course)
+        self.assertEqual(index, {'subdir/blah.txt': asset.id})
+
 
 class TestDescriptionPath(LoreTestCase):
     """
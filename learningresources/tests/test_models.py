@@ -3,6 +3,7 @@ Tests for learningresources models
 """
 from __future__ import unicode_literals
 
+from importlib import import_module
 import json
 import os
 import random
@@ -10,9 +11,10 @@ import string
 from shutil import rmtree
 from tempfile import mkdtemp
 
+from django.apps import apps
 from django.conf import settings
 from django.core.files import File
-from mock import MagicMock
+from mock import MagicMock, patch
 from rest_framework.status import HTTP_200_OK
 
 from learningresources.tests.base import LoreTestCase
@@ -22,6 +24,9 @@ from learningresources.models import (
     LearningResourceType,
     Repository,
     static_asset_basepath,
+    static_asset_blobpath,
+    static_asset_is_blob,
+    static_asset_relative_path,
     StaticAsset,
     FilePathLengthException,
     get_preview_url,
@@ -138,6 +143,34 @@ class TestModels(LoreTestCase):
             'assets/hi/1/runnow/asdf/asdf.txt'
         )
 
+    def test_static_asset_relative_path(self):
+        """Verify course and content addressed paths are made relative"""
+        filename = 'asdf/asdf.txt'
+        content_hash = 'a' * 64
+        course = MagicMock()
+        course.org = 'hi'
+        course.course_number = '1'
+        course.run = 'runnow'
+        blob_path = static_asset_blobpath(content_hash, filename)
+        self.assertEqual(
+            blob_path,
+            'assets/blobs/{hash}/asdf/asdf.txt'.format(hash=content_hash)
+        )
+        self.assertEqual(
+            static_asset_relative_path(
+                course, 'assets/hi/1/runnow/asdf/asdf.txt'),
+            filename
+        )
+        self.assertEqual(
+            static_asset_relative_path(course, blob_path, content_hash),
+            filename
+        )
+        self.assertEqual(
+            static_asset_relative_path(course, blob_path), blob_path)
+        self.assertTrue(static_asset_is_blob(blob_path))
+        self.assertFalse(
+            static_asset_is_blob('assets/hi/1/runnow/asdf/asdf.txt'))
+
     def test_static_asset_filename_length(self):
         """
         Tests that user can use django FileField long up to
@@ -243,3 +276,31 @@ class TestModels(LoreTestCase):
         resource1.description = "new description here"
         resource1.save()
         self.assertTrue(resource_in_results(resource1))
+
+    def test_backfill_content_stripped(self):
+        """
+        The migration storing the text of existing resources fills in every
+        one missing it, in batches.
+        """
+        migration = import_module(
+            "learningresources.migrations.0022_backfill_content_stripped")
+        contents = [
+            "<html>one <b>two</b></html>", "no markup", "<broken", ""
+        ]
+        resources = [
+            self.create_resource(content_xml=content, mpath="/{0}".format(i))
+            for i, content in enumerate(contents)
+        ]
+        ids = [resource.id for resource in resources]
+        LearningResource.objects.filter(id__in=ids).update(
+            content_stripped=None)
+
+        with patch.object(migration, "BATCH_SIZE", 3):
+            migration.backfill_content_stripped(apps, None)
+        self.assertEqual(
+            [
+                LearningResource.objects.get(id=resource_id).content_stripped
+                for resource_id in ids
+            ],
+            ["one two", "no markup", "<broken", ""]
+        )
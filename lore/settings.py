@@ -8,6 +8,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/1.8/ref/settings/
 """
 import ast
+from datetime import timedelta
 import os
 import platform
 
@@ -178,6 +179,14 @@ CACHES = {
     "compressor": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     },
+    "lore_search": {
+        "BACKEND": get_var(
+            "LORE_SEARCH_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": get_var("LORE_SEARCH_CACHE_LOCATION", ""),
+        "TIMEOUT": get_var("LORE_SEARCH_CACHE_TIMEOUT", "300"),
+    },
 }
 
 # Internationalization
@@ -224,6 +233,13 @@ COMPRESS_CACHE_BACKEND = 'compressor'
 # Media and storage settings
 IMPORT_PATH_PREFIX = get_var('LORE_IMPORT_PATH_PREFIX', 'course_archives/')
 EXPORT_PATH_PREFIX = get_var('LORE_EXPORT_PATH_PREFIX', 'resource_exports/')
+# Number of LearningResource rows written per bulk insert during import
+IMPORT_BATCH_SIZE = get_var('LORE_IMPORT_BATCH_SIZE', 500)
+# Threads uploading static assets during import, and attempts per file
+IMPORT_UPLOAD_WORKERS = get_var('LORE_IMPORT_UPLOAD_WORKERS', 4)
+IMPORT_UPLOAD_RETRIES = get_var('LORE_IMPORT_UPLOAD_RETRIES', 3)
+# Store static asset contents by SHA-256 so identical files are uploaded once
+STATIC_ASSET_DEDUP = get_var('LORE_STATIC_ASSET_DEDUP', False)
 MEDIA_ROOT = get_var('MEDIA_ROOT', '/tmp/')
 MEDIA_URL = '/media/'
 LORE_USE_S3 = get_var('LORE_USE_S3', False)
@@ -384,6 +400,54 @@ CELERY_ALWAYS_EAGER = get_var("CELERY_ALWAYS_EAGER", True)
 CELERY_EAGER_PROPAGATES_EXCEPTIONS = get_var(
     "CELERY_EAGER_PROPAGATES_EXCEPTIONS", True)
 
+# Queue reindexing from model signals for a Celery task instead of indexing
+# during the request. Off by default when tasks run eagerly, since the
+# task would run right away anyway.
+REINDEX_DEFERRED = get_var("LORE_REINDEX_DEFERRED", not CELERY_ALWAYS_EAGER)
+# Seconds to collect queued resources before reindexing them
+REINDEX_QUEUE_DELAY = get_var("LORE_REINDEX_QUEUE_DELAY", 5)
+# Seconds between periodic drains of the reindex queue, which catch
+# resources whose scheduled drain was lost
+REINDEX_SWEEP_INTERVAL = get_var("LORE_REINDEX_SWEEP_INTERVAL", 300)
+CELERYBEAT_SCHEDULE = {
+    "drain-reindex-queue": {
+        "task": "search.tasks.drain_reindex_queue",
+        "schedule": timedelta(seconds=REINDEX_SWEEP_INTERVAL),
+    },
+}
+# Resources per worker task during a full reindex, and the most documents
+# and bytes sent in one Elasticsearch bulk request while doing it
+REINDEX_PARTITION_SIZE = get_var("LORE_REINDEX_PARTITION_SIZE", 5000)
+REINDEX_BULK_DOCS = get_var("LORE_REINDEX_BULK_DOCS", 500)
+REINDEX_BULK_BYTES = get_var("LORE_REINDEX_BULK_BYTES", 10 * 1024 * 1024)
+
+# Elasticsearch client: HTTP connections kept open per process, seconds to
+# wait for a response, retries of requests which fail to connect or time
+# out, seconds to wait before the first retry (doubled for each one), and
+# the most seconds a request may take including its retries
+ES_POOL_SIZE = get_var("LORE_ES_POOL_SIZE", 10)
+ES_TIMEOUT = get_var("LORE_ES_TIMEOUT", 10)
+ES_MAX_RETRIES = get_var("LORE_ES_MAX_RETRIES", 3)
+ES_RETRY_BACKOFF = get_var("LORE_ES_RETRY_BACKOFF", 0.5)
+ES_MAX_RETRY_TIME = get_var("LORE_ES_MAX_RETRY_TIME", 10)
+# Discover the other nodes of the Elasticsearch cluster
+ES_SNIFF = get_var("LORE_ES_SNIFF", False)
+# Seconds to trust a check that the search index exists
+ES_VERIFY_TTL = get_var("LORE_ES_VERIFY_TTL", 60)
+# Cache search responses in the lore_search cache. Entries are keyed by a
+# generation which changes on every index write, so they are never stale,
+# as long as the cache is shared by every process which writes to the index.
+SEARCH_CACHE_ENABLED = get_var("LORE_SEARCH_CACHE_ENABLED", False)
+if (
+        SEARCH_CACHE_ENABLED and
+        CACHES["lore_search"]["BACKEND"] ==
+        "django.core.cache.backends.locmem.LocMemCache"
+):
+    raise ImproperlyConfigured(
+        'You have enabled the search cache, but LORE_SEARCH_CACHE_BACKEND '
+        'is a local memory cache which is not shared between processes'
+    )
+
 # guardian specific settings
 ANONYMOUS_USER_ID = None
 GUARDIAN_RAISE_403 = True
@@ -34,8 +34,8 @@ from learningresources.models import (
     LearningResource,
     StaticAsset,
     LearningResourceType,
-    STATIC_ASSET_BASEPATH,
     get_preview_url as resource_preview_url,
+    static_asset_relative_path,
 )
 
 
@@ -292,12 +292,11 @@ class StaticAssetSerializer(ModelSerializer):
     @staticmethod
     def get_name(static_asset_obj):
         """Method to get the name of the asset."""
-        basepath = STATIC_ASSET_BASEPATH.format(
-            org=static_asset_obj.course.org,
-            course_number=static_asset_obj.course.course_number,
-            run=static_asset_obj.course.run,
+        return static_asset_relative_path(
+            static_asset_obj.course,
+            static_asset_obj.asset.name,
+            static_asset_obj.content_hash,
         )
-        return static_asset_obj.asset.name.replace(basepath, '')
 
 
 class LearningResourceExportSerializer(Serializer):
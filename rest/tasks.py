@@ -11,6 +11,7 @@ from django.http.response import Http404
 from rest_framework.exceptions import ValidationError
 
 from exporter.tasks import export_resources
+from importer.progress import PROGRESS_STATE
 from learningresources.api import get_repo
 from learningresources.models import LearningResource
 
@@ -82,6 +83,10 @@ def create_task_result_dict(initial_data):
         state = "failure"
         result = {'error': str(async_result.result)}
 
+    if (task_type == IMPORT_TASK_TYPE and state == "success" and
+            isinstance(result, dict)):
+        state, result = get_import_progress(result)
+
     return {
         "id": task_id,
         "status": state,
@@ -91,6 +96,47 @@ def create_task_result_dict(initial_data):
     }
 
 
+def get_import_progress(result):
+    """
+    Follow the per-course subtasks started by an import task.
+
+    Args:
+        result (dict): Return value of importer.tasks.import_file.
+    Returns:
+        tuple:
+            The task state and a result with the status of each course,
+            including the progress of courses still being imported.
+            The state is "failure" if any course failed to import.
+    """
+    if "chord_id" in result:
+        chord_result = AsyncResult(result["chord_id"])
+        if chord_result.successful():
+            result = chord_result.get()
+        elif chord_result.failed():
+            return "failure", {'error': str(chord_result.result)}
+        else:
+            courses = []
+            for course in result["courses"]:
+                async_result = AsyncResult(course["task_id"])
+                if async_result.successful():
+                    courses.append(async_result.get())
+                elif async_result.failed():
+                    courses.append({
+                        "root": course["root"],
+                        "status": "failure",
+                        "error": str(async_result.result),
+                    })
+                elif async_result.state == PROGRESS_STATE:
+                    courses.append(dict(course, progress=async_result.info))
+                else:
+                    courses.append(course)
+            return "processing", {"courses": courses}
+
+    if any(course["status"] == "failure" for course in result["courses"]):
+        return "failure", result
+    return "success", result
+
+
 def get_tasks(session):
     """
     Get initial task data for session.
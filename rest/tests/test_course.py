@@ -3,6 +3,9 @@ REST tests for courses
 """
 from __future__ import unicode_literals
 
+from elasticsearch import Elasticsearch
+import mock
+
 from rest.tests.base import (
     REPO_BASE,
     RESTAuthTestCase,
@@ -241,6 +244,29 @@ class TestCourse(RESTTestCase):
             expected_status=404
         )
 
+    def test_delete_course_index(self):
+        """
+        Deleting a course removes its learning resources from the index
+        in bulk instead of one request per resource.
+        """
+        self.import_course_tarball(self.repo)
+        self.assertEqual(
+            self.get_results()['count'], self.toy_resource_count + 1)
+        course = Course.objects.exclude(id=self.course.id).get()
+
+        with mock.patch.object(
+            Elasticsearch, 'delete', autospec=True
+        ) as delete_mock:
+            self.delete_course(self.repo.slug, course.id)
+        self.assertFalse(delete_mock.called)
+
+        results = self.get_results()
+        self.assertEqual(results['count'], 1)
+        self.assertEqual(
+            [row['id'] for row in results['results']],
+            [self.resource.id]
+        )
+
 
 class TestCourseAuthorization(RESTAuthTestCase):
     """
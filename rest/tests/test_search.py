@@ -4,6 +4,8 @@ Tests for search endpoint.
 
 from __future__ import unicode_literals
 
+from elasticsearch import Elasticsearch
+import mock
 from rest_framework.status import (
     HTTP_200_OK,
     HTTP_405_METHOD_NOT_ALLOWED,
@@ -149,9 +151,40 @@ class TestSearch(RESTTestCase):
         Make sure we're not hitting the database for the search
         more than necessary.
         """
-        with self.assertNumQueries(9):
+        with self.assertNumQueries(7):
             self.get_results()
 
+    def test_num_es_requests(self):
+        """
+        Make sure the count, facet counts and page of results come from
+        a single Elasticsearch request.
+        """
+        self.import_course_tarball(self.repo)
+        with mock.patch.object(
+            Elasticsearch, 'search', autospec=True,
+            side_effect=Elasticsearch.search
+        ) as search_mock, mock.patch.object(
+            Elasticsearch, 'count', autospec=True
+        ) as count_mock:
+            resp = self.client.get(
+                "{repo_base}{repo_slug}/search/?page=2&page_size=5".format(
+                    repo_base=REPO_BASE,
+                    repo_slug=self.repo.slug,
+                )
+            )
+        self.assertEqual(HTTP_200_OK, resp.status_code)
+        self.assertEqual(search_mock.call_count, 1)
+        self.assertFalse(count_mock.called)
+
+        results = as_json(resp)
+        self.assertEqual(results['count'], self.toy_resource_count + 1)
+        self.assertEqual(len(results['results']), 5)
+        self.assertNotEqual(results['facet_counts'], {})
+        self.assertEqual(
+            [row['id'] for row in results['results']],
+            [row['id'] for row in self.get_results()['results'][5:10]]
+        )
+
     def test_sortby(self):
         """
         Test that sortby works as expected.
@@ -27,7 +27,11 @@ from rest.tests.base import (
     API_BASE,
     as_json,
 )
-from rest.tasks import EXPORT_TASK_TYPE
+from rest.tasks import (
+    create_task_result_dict,
+    EXPORT_TASK_TYPE,
+    IMPORT_TASK_TYPE,
+)
 from learningresources.models import LearningResource
 from exporter.tests.test_export import assert_resource_directory
 
@@ -253,6 +257,65 @@ class TestTasks(RESTTestCase):
         self.get_task(task_id, expected_status=HTTP_404_NOT_FOUND)
         self.assertEqual(self.get_tasks()['count'], 0)
 
+    def test_import_progress(self):
+        """
+        Test that import tasks report the status of each course.
+        """
+        initial_data = {
+            "id": "import",
+            "initial_state": "SUCCESS",
+            "task_type": IMPORT_TASK_TYPE,
+            "task_info": {},
+            "result": {
+                "chord_id": "chord",
+                "courses": [
+                    {"root": "one", "task_id": "one", "status": "processing"},
+                    {"root": "two", "task_id": "two", "status": "processing"},
+                ]
+            }
+        }
+        one = {"root": "one", "status": "success", "course_id": 3}
+        results = {
+            "chord": mock.Mock(
+                **{"successful.return_value": False,
+                   "failed.return_value": False}
+            ),
+            "one": mock.Mock(
+                **{"successful.return_value": True, "get.return_value": one}
+            ),
+            "two": mock.Mock(
+                state="PROGRESS",
+                info={"phase": "static_upload"},
+                **{"successful.return_value": False,
+                   "failed.return_value": False}
+            ),
+        }
+        with mock.patch('rest.tasks.AsyncResult') as async_result:
+            async_result.side_effect = results.get
+            result = create_task_result_dict(initial_data)
+        self.assertEqual(result['status'], 'processing')
+        self.assertEqual(
+            result['result']['courses'],
+            [
+                one,
+                dict(
+                    initial_data['result']['courses'][1],
+                    progress={"phase": "static_upload"}
+                ),
+            ]
+        )
+
+        two = {"root": "two", "status": "failure", "error": "bad course"}
+        results["chord"] = mock.Mock(
+            **{"successful.return_value": True,
+               "get.return_value": {"courses": [one, two]}}
+        )
+        with mock.patch('rest.tasks.AsyncResult') as async_result:
+            async_result.side_effect = results.get
+            result = create_task_result_dict(initial_data)
+        self.assertEqual(result['status'], 'failure')
+        self.assertEqual(result['result'], {"courses": [one, two]})
+
     @override_settings(
         CELERY_EAGER_PROPAGATES_EXCEPTIONS=False
     )
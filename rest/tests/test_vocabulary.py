@@ -922,7 +922,7 @@ class TestVocabulary(RESTTestCase):
             "terms": [term_slug]
         })
 
-        with self.assertNumQueries(39):
+        with self.assertNumQueries(38):
             # Remove the types which will require a reindex.
             self.patch_vocabulary(self.repo.slug, vocab_slug, {
                 "learning_resource_types": []
@@ -938,7 +938,7 @@ class TestVocabulary(RESTTestCase):
             "terms": [term_slug]
         })
 
-        with self.assertNumQueries(31):
+        with self.assertNumQueries(30):
             self.delete_term(self.repo.slug, vocab_slug, term_slug)
 
         # Add back term, reassign the term, then delete the vocabulary.
@@ -946,7 +946,7 @@ class TestVocabulary(RESTTestCase):
         self.patch_learning_resource(self.repo.slug, self.resource.id, {
             "terms": [term_slug]
         })
-        with self.assertNumQueries(30):
+        with self.assertNumQueries(29):
             self.delete_vocabulary(self.repo.slug, vocab_slug)
 
     def test_vocabulary_rename(self):
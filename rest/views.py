@@ -73,6 +73,7 @@ from rest.tasks import (
 from rest.util import CheckValidMemberParamMixin
 from search.api import construct_queryset
 from search.tasks import index_resources
+from search.utils import batched_index_deletes
 from taxonomy.models import Vocabulary
 
 from learningresources.api import (
@@ -172,7 +173,9 @@ class CourseDetail(RetrieveDestroyAPIView):
         Deletes a course in a repo with all the related learning resources and
         static assets
         """
-        return super(CourseDetail, self).delete(request, *args, **kwargs)
+        # Remove the cascaded learning resources from the index together.
+        with batched_index_deletes():
+            return super(CourseDetail, self).delete(request, *args, **kwargs)
 
 
 class VocabularyList(ListCreateAPIView):
@@ -979,6 +982,27 @@ class RepositorySearchList(GenericViewSet):
         sortby = self.request.GET.get('sortby', '')
         return construct_queryset(repo_slug, query, selected_facets, sortby)
 
+    def prefetch_page(self, queryset):
+        """
+        Fetch the requested page of results in the same Elasticsearch
+        request as the count and facet counts.
+        """
+        if self.paginator is None:
+            return
+        page_size = self.paginator.get_page_size(self.request)
+        if page_size is None:
+            return
+        try:
+            page_number = int(self.request.query_params.get(
+                self.paginator.page_query_param, 1))
+        except ValueError:
+            # Let the paginator deal with it.
+            return
+        if page_number < 1:
+            return
+        start = (page_number - 1) * page_size
+        queryset.prefetch(start, start + page_size)
+
     @statsd.timer('lore.rest.repository_search_list')
     def list(self, *args, **kwargs):  # pylint: disable=unused-argument
         """
@@ -986,6 +1010,7 @@ class RepositorySearchList(GenericViewSet):
         an extra value for facet_counts.
         """
         queryset = self.filter_queryset(self.get_queryset())
+        self.prefetch_page(queryset)
         facet_counts = queryset.aggregations()
 
         page = self.paginate_queryset(queryset)
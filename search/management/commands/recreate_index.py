@@ -4,8 +4,11 @@ Shell command to refresh the Elasticsearch index.
 
 from __future__ import unicode_literals
 
+import time
+
 from django.core.management.base import BaseCommand
 
+from search.tasks import recreate_index as recreate_index_task
 from search.utils import recreate_index
 
 
@@ -13,8 +16,36 @@ class Command(BaseCommand):
     """
     Command for recreate_index.
     """
-    help = "Clears the Elasticsearch index and recreates it."
+    help = (
+        "Rebuilds the Elasticsearch index in a new index and swaps it in."
+    )
+
+    def add_arguments(self, parser):
+        """Add argparse arguments."""
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Number of processes indexing resources.",
+        )
+        parser.add_argument(
+            '--celery', action='store_true', default=False,
+            help="Index resources using Celery workers instead.",
+        )
 
     def handle(self, *args, **options):
         """Command for recreate_index"""
-        recreate_index()
+        if options["celery"]:
+            recreate_index_task.delay()
+            self.stdout.write("Rebuilding the index using Celery workers.")
+            return
+
+        started = time.time()
+        count = recreate_index(workers=options["workers"])
+        elapsed = time.time() - started
+        self.stdout.write(
+            "Indexed {count} resources in {elapsed:.1f} seconds "
+            "({rate:.1f} per second).".format(
+                count=count,
+                elapsed=elapsed,
+                rate=count / elapsed if elapsed > 0 else 0,
+            )
+        )
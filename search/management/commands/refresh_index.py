@@ -7,7 +7,7 @@ from __future__ import unicode_literals
 from django.core.management.base import BaseCommand
 
 from learningresources.models import LearningResource
-from search.utils import index_resources, create_mapping
+from search.utils import index_resources, create_mapping, indexing_session
 
 
 class Command(BaseCommand):
@@ -19,4 +19,6 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         """Refreshes the Elasticsearch index."""
         create_mapping()
-        index_resources(LearningResource.objects.values_list("id", flat=True))
+        with indexing_session(bulk=True):
+            index_resources(
+                LearningResource.objects.values_list("id", flat=True))
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+# pylint: skip-file
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_update_mapping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingReindex',
+            fields=[
+                ('id', models.AutoField(
+                    verbose_name='ID', serialize=False, auto_created=True,
+                    primary_key=True
+                )),
+                ('resource_id', models.IntegerField(unique=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+# pylint: skip-file
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0003_pendingreindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingreindex',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ScheduledDrain',
+            fields=[
+                ('id', models.AutoField(
+                    verbose_name='ID', serialize=False, auto_created=True,
+                    primary_key=True
+                )),
+                ('scheduled_at', models.DateTimeField()),
+            ],
+        ),
+    ]
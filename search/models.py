@@ -0,0 +1,42 @@
+"""
+Models for the search app.
+"""
+
+from __future__ import unicode_literals
+
+from django.db import models
+
+
+class PendingReindex(models.Model):
+    """
+    A LearningResource waiting for its search index entry to be updated.
+    """
+    resource_id = models.IntegerField(unique=True)
+    # Bumped when the resource is queued again, so a drain which indexed
+    # an earlier version leaves the row for the next drain.
+    version = models.IntegerField(default=0)
+
+
+class ScheduledDrain(models.Model):
+    """
+    A single row claimed by the process which schedules a drain of the
+    reindex queue, so only one drain is waiting at a time across every
+    process.
+    """
+    scheduled_at = models.DateTimeField()
+
+
+class RebuildingIndex(models.Model):
+    """
+    An index being built by recreate_index, which changes to resources are
+    written to as well as the index in use.
+    """
+    index_name = models.TextField(unique=True)
+
+
+class LabelVersion(models.Model):
+    """
+    A single row counting changes to Terms and Vocabularies. Facet labels
+    are cached under the current count.
+    """
+    version = models.IntegerField(default=0)
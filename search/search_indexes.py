@@ -18,8 +18,12 @@ from collections import defaultdict
 import logging
 
 from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
 
 from learningresources.models import Course, LearningResource
+from search.models import LabelVersion
+from taxonomy.models import Term, Vocabulary
 
 log = logging.getLogger(__name__)
 
@@ -34,20 +38,68 @@ def get_course_metadata(course_id):
     Returns:
         data (dict): Metadata about course.
     """
-    key = "course_metadata_{0}".format(course_id)
+    key = _course_metadata_key(course_id)
     data = cache.get(key, {})
     if data == {}:
         course = Course.objects.select_related("repository").get(id=course_id)
-        data["run"] = course.run
-        data["course_number"] = course.course_number
-        data["org"] = course.org
-        data["repo_slug"] = course.repository.slug
+        data = _course_metadata(course)
         cache.set(key, data)
     # Return `data` directly, not from the cache. Otherwise, if caching
     # is disabled (TIMEOUT == 0), this will always return nothing.
     return data
 
 
+def get_courses_metadata(course_ids):
+    """
+    Caches and returns metadata for several courses, fetching the ones
+    which aren't cached in one query.
+    Args:
+        course_ids (iterable of int): Primary keys of Courses
+    Returns:
+        data (dict): Metadata about each course, keyed by course id.
+    """
+    keys = {course_id: _course_metadata_key(course_id)
+            for course_id in set(course_ids)}
+    cached = cache.get_many(keys.values())
+    data = {
+        course_id: cached[key] for course_id, key in keys.items()
+        if key in cached
+    }
+    missing = [course_id for course_id in keys if course_id not in data]
+    if len(missing) > 0:
+        courses = Course.objects.select_related("repository").filter(
+            id__in=missing)
+        for course in courses:
+            data[course.id] = _course_metadata(course)
+        cache.set_many({
+            keys[course_id]: data[course_id] for course_id in missing
+            if course_id in data
+        })
+    return data
+
+
+def _course_metadata_key(course_id):
+    """Cache key for course metadata."""
+    return "course_metadata_{0}".format(course_id)
+
+
+def _course_metadata(course):
+    """
+    Metadata about a course which is indexed with its resources.
+    Args:
+        course (learningresources.models.Course): Course with its
+            repository selected
+    Returns:
+        data (dict): Metadata about course.
+    """
+    return {
+        "run": course.run,
+        "course_number": course.course_number,
+        "org": course.org,
+        "repo_slug": course.repository.slug,
+    }
+
+
 def get_vocabs(resource_id):
     """
     Returns taxonomy metadata for a course.
@@ -62,3 +114,88 @@ def get_vocabs(resource_id):
     for rel in rels.iterator():
         data[rel.term.vocabulary_id].append(rel.term_id)
     return dict(data)
+
+
+def get_term_labels(term_ids, version=None):
+    """
+    Caches and returns the labels of Terms, fetching the ones which
+    aren't cached in one query.
+    Args:
+        term_ids (iterable of int): Primary keys of Terms
+        version (int): Result of get_label_version, looked up if None
+    Returns:
+        data (dict): Term labels keyed by term id.
+    """
+    return _get_labels(Term, "label", term_ids, version)
+
+
+def get_vocabulary_labels(vocab_ids, version=None):
+    """
+    Caches and returns the names of Vocabularies, fetching the ones which
+    aren't cached in one query.
+    Args:
+        vocab_ids (iterable of int): Primary keys of Vocabularies
+        version (int): Result of get_label_version, looked up if None
+    Returns:
+        data (dict): Vocabulary names keyed by vocabulary id.
+    """
+    return _get_labels(Vocabulary, "name", vocab_ids, version)
+
+
+def get_label_version():
+    """
+    Returns the version of the facet labels. Cached labels are keyed by
+    it, and it's kept in the database so a Term or Vocabulary changed in
+    one process stops every process using the labels it cached.
+    Returns:
+        version (int): Current version.
+    """
+    return LabelVersion.objects.filter(id=1).values_list(
+        "version", flat=True).first() or 0
+
+
+def bump_label_version():
+    """
+    Stop using the facet labels cached before a Term or Vocabulary
+    changed.
+    """
+    if LabelVersion.objects.filter(id=1).update(
+            version=F("version") + 1) > 0:
+        return
+    try:
+        with transaction.atomic():
+            LabelVersion.objects.create(id=1, version=1)
+    except IntegrityError:
+        # Created by someone else in the meantime.
+        LabelVersion.objects.filter(id=1).update(version=F("version") + 1)
+
+
+def _get_labels(model, field, ids, version):
+    """Look up labels in the cache, then the database."""
+    ids = set(ids)
+    if len(ids) == 0:
+        return {}
+    if version is None:
+        version = get_label_version()
+    keys = {instance_id: _label_key(model, instance_id, version)
+            for instance_id in ids}
+    cached = cache.get_many(keys.values())
+    data = {
+        instance_id: cached[key] for instance_id, key in keys.items()
+        if key in cached
+    }
+    missing = [instance_id for instance_id in keys if instance_id not in data]
+    if len(missing) > 0:
+        data.update(model.objects.filter(
+            id__in=missing).values_list("id", field))
+        cache.set_many({
+            keys[instance_id]: data[instance_id] for instance_id in missing
+            if instance_id in data
+        })
+    return data
+
+
+def _label_key(model, instance_id, version):
+    """Cache key for the label of a Term or Vocabulary."""
+    return "{model}_label_{version}_{id}".format(
+        model=model.__name__.lower(), version=version, id=instance_id)
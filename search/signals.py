@@ -8,7 +8,13 @@ many-to-many fields.
 
 import logging
 
-from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_save,
+)
 from django.dispatch import receiver
 from statsd.defaults.django import statsd
 
@@ -27,8 +33,34 @@ def handle_m2m_save(sender, **kwargs):
     # Update cache for the LearningResource if it's already set.
     get_vocabs(instance.id)
     # Update Elasticsearch index:
-    from search.utils import index_resources
-    index_resources([instance.id])
+    from search.utils import queue_reindex
+    queue_reindex([instance.id])
+
+
+@receiver(post_init)
+def handle_resource_init(sender, **kwargs):
+    """Remember the XML a LearningResource was loaded with."""
+    instance = kwargs.pop("instance")
+    if instance.__class__.__name__ != "LearningResource":
+        return
+    # pylint: disable=protected-access
+    instance._loaded_content_xml = instance.content_xml
+
+
+@receiver(pre_save)
+def handle_resource_pre_save(sender, **kwargs):
+    """Work out the text to index when a LearningResource's XML changes."""
+    instance = kwargs.pop("instance")
+    if instance.__class__.__name__ != "LearningResource":
+        return
+    # pylint: disable=protected-access
+    if (instance.content_stripped is not None and
+            instance.content_xml == getattr(
+                instance, "_loaded_content_xml", None)):
+        return
+    from search.utils import strip_xml
+    instance.content_stripped = strip_xml(instance.content_xml)
+    instance._loaded_content_xml = instance.content_xml
 
 
 @statsd.timer('lore.elasticsearch.taxonomy_update')
@@ -42,18 +74,50 @@ def handle_resource_update(sender, **kwargs):
     instance = kwargs.pop("instance")
     if instance.__class__.__name__ != "LearningResource":
         return
-    from search.utils import index_resources
-    index_resources([instance.id])
+    from search.utils import queue_reindex
+    queue_reindex([instance.id])
 
 
 @statsd.timer('lore.elasticsearch.taxonomy_delete')
 @receiver(post_delete)
 def handle_resource_deletion(sender, **kwargs):
     """Delete index when instance is deleted."""
-    # We currently only use this in tests, the user cannot delete resources
-    # at the moment.
+    # Resources are deleted along with their course or when they disappear
+    # from a reimported course, inside batched_index_deletes().
     instance = kwargs.pop("instance")
     if instance.__class__.__name__ != "LearningResource":
         return
     from search.utils import delete_resource_from_index
     delete_resource_from_index(instance)
+
+
+@receiver(post_save)
+def handle_vocabulary_save(sender, **kwargs):
+    """Add a new Vocabulary to the Elasticsearch mapping."""
+    if not kwargs["created"]:
+        return
+    instance = kwargs.pop("instance")
+    if instance.__class__.__name__ != "Vocabulary":
+        return
+    from search.utils import add_vocabulary_mapping
+    add_vocabulary_mapping(instance.id)
+
+
+@receiver(post_delete)
+def handle_vocabulary_deletion(sender, **kwargs):
+    """Forget the mapping of a deleted Vocabulary."""
+    instance = kwargs.pop("instance")
+    if instance.__class__.__name__ != "Vocabulary":
+        return
+    from search.utils import clear_vocabulary_mapping_cache
+    clear_vocabulary_mapping_cache()
+
+
+@receiver([post_save, post_delete])
+def handle_label_change(sender, **kwargs):
+    """Stop using cached facet labels when a Term or Vocabulary changes."""
+    instance = kwargs.pop("instance")
+    if instance.__class__.__name__ not in ("Term", "Vocabulary"):
+        return
+    from search.search_indexes import bump_label_version
+    bump_label_version()
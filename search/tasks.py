@@ -4,6 +4,9 @@ Celery tasks for the search module.
 
 from __future__ import unicode_literals
 
+import time
+
+from celery import chord
 from statsd.defaults.django import statsd
 from lore.celery import async
 
@@ -14,9 +17,11 @@ def refresh_index(index_name):
     """
     Refresh the Elasticsearch index via Celery.
     """
-    from search.utils import get_conn
+    from search.utils import bump_index_generation, get_conn
     conn = get_conn()
     conn.indices.refresh(index=index_name)
+    # Searches made before the refresh could have cached older results.
+    bump_index_generation()
 
 
 @async.task
@@ -26,4 +31,68 @@ def index_resources(resource_ids):
     Reindex the given resources.
     """
     from search.utils import index_resources as _index_resources
-    _index_resources(resource_ids)
+    # Run after taxonomy edits whose results the user looks at next.
+    _index_resources(resource_ids, refresh=True)
+
+
+@async.task
+@statsd.timer('lore.search.tasks.drain_reindex_queue')
+def drain_reindex_queue():
+    """
+    Reindex the resources queued by search.utils.queue_reindex.
+    """
+    from search.utils import drain_reindex_queue as _drain_reindex_queue
+    _drain_reindex_queue()
+
+
+@async.task
+@statsd.timer('lore.search.tasks.recreate_index')
+def recreate_index():
+    """
+    Rebuild the Elasticsearch index using a subtask per range of resources.
+
+    The subtasks are gathered in a chord which swaps in the new index once
+    they have all finished.
+    """
+    from search.utils import resource_id_ranges, start_recreate_index
+    started = time.time()
+    new_index, live_settings = start_recreate_index()
+    ranges = resource_id_ranges()
+    callback = finish_recreate_index.s(new_index, live_settings, started)
+    callback.link_error(abandon_recreate_index.si(new_index))
+    if len(ranges) == 0:
+        callback.delay([])
+        return
+    chord([
+        index_resource_range.si(start_id, end_id, new_index)
+        for start_id, end_id in ranges
+    ])(callback)
+
+
+@async.task
+@statsd.timer('lore.search.tasks.index_resource_range')
+def index_resource_range(start_id, end_id, index_name):
+    """
+    Index one range of resources for recreate_index.
+    """
+    from search.utils import index_resource_range as _index_resource_range
+    return _index_resource_range(start_id, end_id, index_name)
+
+
+@async.task
+def finish_recreate_index(counts, new_index, live_settings, started):
+    """
+    Swap in the index built by recreate_index.
+    """
+    from search.utils import finish_recreate_index as _finish_recreate_index
+    return _finish_recreate_index(
+        new_index, live_settings, sum(counts), started)
+
+
+@async.task
+def abandon_recreate_index(new_index):
+    """
+    Delete the index from a recreate_index which failed.
+    """
+    from search.utils import abandon_recreate_index as _abandon
+    _abandon(new_index)
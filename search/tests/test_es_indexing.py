@@ -11,8 +11,14 @@ from __future__ import unicode_literals
 import json
 import logging
 
+import mock
 from django.contrib.auth.models import User
+from django.test import override_settings
 from django.test.testcases import call_command
+from elasticsearch.exceptions import (
+    ConnectionError as ESConnectionError,
+    ConnectionTimeout,
+)
 from rest_framework.status import HTTP_200_OK
 
 from learningresources.api import create_repo
@@ -21,18 +27,27 @@ from learningresources.models import LearningResource
 from importer.api import import_course_from_file
 from rest.tests.base import API_BASE
 from search.exceptions import ReindexException
+from search.models import RebuildingIndex
 from search.search_indexes import cache
 from search.sorting import LoreSortingFields
+from search.tasks import recreate_index as recreate_index_task
 from search.tests.base_es import SearchTestCase
 from search.utils import (
+    BackoffConnection,
     INDEX_NAME,
+    abandon_recreate_index,
     create_mapping,
     get_conn,
     index_resources,
+    indexing_session,
+    recreate_index,
+    resource_id_ranges,
     search_index,
     refresh_index,
     remove_index,
+    start_recreate_index,
 )
+from taxonomy.models import Vocabulary, make_vocab_key
 
 log = logging.getLogger(__name__)
 
@@ -79,6 +94,33 @@ class TestImport(LoreTestCase):
             count += 1
         self.assertEqual(count, results.count())
 
+    def test_all_scrolls(self):
+        """
+        All results are fetched in order with a scroll, a page of
+        SCROLL_PAGE_LENGTH at a time.
+        """
+        import_course_from_file(self.course_zip, self.repo.id, self.user.id)
+        refresh_index()
+        results = search_index()
+        expected = [
+            hit.id[0] for page in range(1, results.page_count() + 1)
+            for hit in results.get_page(page)
+        ]
+        self.assertEqual(len(expected), 19)
+
+        conn = get_conn()
+        with mock.patch(
+            'search.utils.SCROLL_PAGE_LENGTH', 5
+        ), mock.patch.object(
+            conn, 'scroll', wraps=conn.scroll
+        ) as scroll, mock.patch.object(
+            conn, 'clear_scroll', wraps=conn.clear_scroll
+        ) as clear_scroll:
+            self.assertEqual(
+                [hit.id[0] for hit in results.all()], expected)
+        self.assertEqual(scroll.call_count, 4)
+        self.assertEqual(clear_scroll.call_count, 1)
+
     def test_update(self):
         """
         Items should only be indexed on update, not creation.
@@ -152,6 +194,67 @@ class TestIndexing(SearchTestCase):
         self.resource.save()
         self.assertTrue(self.count_results(search_text) == 1)
 
+    @override_settings(SEARCH_CACHE_ENABLED=True)
+    def test_search_cache(self):
+        """
+        Repeated searches are served from the cache until the index changes.
+        """
+        search_text = "The quick brown fox."
+        self.resource.content_xml = search_text
+        self.resource.save()
+        self.assertEqual(
+            [hit.id for hit in self.search(search_text)[0:10]],
+            [self.resource.id]
+        )
+
+        conn = get_conn()
+        with mock.patch.object(conn, 'search', wraps=conn.search) as search:
+            self.assertEqual(
+                [hit.id for hit in self.search(search_text)[0:10]],
+                [self.resource.id]
+            )
+            self.assertFalse(search.called)
+
+            self.resource.content_xml = "Jumps over the lazy dog."
+            self.resource.save()
+            self.assertEqual(self.count_results(search_text), 0)
+            self.assertEqual(search.call_count, 1)
+
+    def test_filter_context(self):
+        """
+        Repository and facet restrictions are filters, so only the text
+        query is scored.
+        """
+        vocab_key = make_vocab_key(self.vocabulary.id)
+        results = search_index(
+            tokens="quick",
+            repo_slug=self.repo.slug,
+            terms={vocab_key: str(self.terms[0].id), "run": None},
+        )
+        # pylint: disable=protected-access
+        filtered = results._search.to_dict()["query"]["filtered"]
+        self.assertEqual(list(filtered["query"].keys()), ["multi_match"])
+        self.assertEqual(
+            filtered["filter"],
+            {"bool": {
+                "must": [
+                    {"term": {vocab_key: str(self.terms[0].id)}},
+                    {"term": {"repository": self.repo.slug}},
+                ],
+                "must_not": [{"exists": {"field": "run"}}],
+            }}
+        )
+
+        self.resource.content_xml = "The quick brown fox."
+        self.resource.save()
+        self.assertEqual(results.count(), 0)
+        self.resource.terms.add(self.terms[0])
+        self.assertEqual(search_index(
+            tokens="quick",
+            repo_slug=self.repo.slug,
+            terms={vocab_key: str(self.terms[0].id)},
+        ).count(), 1)
+
     def test_index_vocabulary(self):
         """
         Test that LearningResource indexes are updated when a
@@ -170,6 +273,103 @@ class TestIndexing(SearchTestCase):
         self.assertEqual(self.count_faceted_results(
             self.vocabulary.id, term.id), 0)
 
+    def test_verification_cached(self):
+        """The index is only checked again once the check has expired."""
+        conn = get_conn()
+        with mock.patch.object(
+            conn.indices, 'get_mapping', wraps=conn.indices.get_mapping
+        ) as get_mapping:
+            get_conn()
+            self.assertFalse(get_mapping.called)
+            with override_settings(ES_VERIFY_TTL=0):
+                get_conn()
+            self.assertEqual(get_mapping.call_count, 1)
+
+    @override_settings(ES_MAX_RETRIES=2, ES_RETRY_BACKOFF=0.5)
+    def test_retry_with_backoff(self):
+        """Requests which fail to connect are retried after a wait."""
+        connection = BackoffConnection()
+        error = ESConnectionError("N/A", "unavailable", None)
+        with mock.patch(
+            'search.utils.Urllib3HttpConnection.perform_request',
+            side_effect=[error, error, (200, {}, "{}")],
+        ), mock.patch('search.utils.time.sleep') as sleep:
+            self.assertEqual(
+                connection.perform_request("GET", "/"), (200, {}, "{}"))
+        self.assertEqual(
+            [call[0][0] for call in sleep.call_args_list], [0.5, 1.0])
+
+        with mock.patch(
+            'search.utils.Urllib3HttpConnection.perform_request',
+            side_effect=error,
+        ), mock.patch('search.utils.time.sleep') as sleep:
+            with self.assertRaises(ESConnectionError):
+                connection.perform_request("GET", "/")
+        self.assertEqual(sleep.call_count, 2)
+
+    @override_settings(
+        ES_MAX_RETRIES=3, ES_RETRY_BACKOFF=0.5, ES_MAX_RETRY_TIME=12)
+    def test_retry_timeouts(self):
+        """
+        Writes which time out aren't retried, and retries stop once they
+        would take longer than ES_MAX_RETRY_TIME.
+        """
+        connection = BackoffConnection()
+        timeout = ConnectionTimeout("TIMEOUT", "timed out", None)
+        with mock.patch(
+            'search.utils.Urllib3HttpConnection.perform_request',
+            side_effect=timeout,
+        ) as perform_request, mock.patch(
+            'search.utils.time.sleep'
+        ) as sleep:
+            with self.assertRaises(ConnectionTimeout):
+                connection.perform_request("POST", "/_bulk", body="{}")
+        self.assertEqual(perform_request.call_count, 1)
+        self.assertFalse(sleep.called)
+
+        # Each attempt takes 5 seconds to time out.
+        with mock.patch(
+            'search.utils.Urllib3HttpConnection.perform_request',
+            side_effect=timeout,
+        ) as perform_request, mock.patch(
+            'search.utils.time'
+        ) as mock_time:
+            mock_time.time.side_effect = [0, 5, 11.5]
+            with self.assertRaises(ConnectionTimeout):
+                connection.perform_request("GET", "/_search")
+        self.assertEqual(perform_request.call_count, 2)
+        self.assertEqual(
+            [call[0][0] for call in mock_time.sleep.call_args_list], [0.5])
+
+    def test_vocabulary_mapping(self):
+        """
+        New vocabularies are added to the mapping when they're created,
+        and the mapping isn't fetched again while indexing.
+        """
+        vocab = Vocabulary.objects.create(
+            repository_id=self.repo.id, name="new vocab",
+            description="new vocab", required=False, vocabulary_type="f",
+            weight=1
+        )
+        vocab_key = make_vocab_key(vocab.id)
+        mapping = list(get_conn().indices.get_mapping(
+            index=INDEX_NAME, doc_type="learningresource").values())[0]
+        self.assertEqual(
+            mapping["mappings"]["learningresource"]["properties"][vocab_key],
+            {"type": "string", "index": "not_analyzed"}
+        )
+
+        index_resources([self.resource.id])
+        with mock.patch('search.utils.Mapping.from_es') as from_es:
+            index_resources([self.resource.id])
+            Vocabulary.objects.create(
+                repository_id=self.repo.id, name="another vocab",
+                description="another vocab", required=False,
+                vocabulary_type="f", weight=1
+            )
+            index_resources([self.resource.id])
+        self.assertFalse(from_es.called)
+
     def test_strip_xml(self):
         """Indexed content_xml should have XML stripped."""
         xml = "<tag>you're it</tag>"
@@ -179,6 +379,23 @@ class TestIndexing(SearchTestCase):
         self.assertTrue(self.count_results("you're it") == 1)
         self.assertTrue(self.count_results("tag") == 0)
 
+    def test_content_not_in_source(self):
+        """
+        Content is searchable but neither the XML nor the stripped text
+        is kept in the document source.
+        """
+        self.resource.content_xml = "<tag>you're it</tag>"
+        self.resource.save()
+        refresh_index()
+        self.assertEqual(self.count_results("you're it"), 1)
+        source = get_conn().get(
+            index=INDEX_NAME, doc_type="learningresource",
+            id=self.resource.id,
+        )["_source"]
+        self.assertNotIn("content_xml", source)
+        self.assertNotIn("content_stripped", source)
+        self.assertEqual(source["title"], self.resource.title)
+
     def test_sorting(self):
         """Test sorting for search"""
         # remove the default resource to control the environment
@@ -301,7 +518,7 @@ class TestIndexing(SearchTestCase):
 
         # Reindex all resources
         resource_ids = LearningResource.objects.values_list("id", flat=True)
-        index_resources(resource_ids)
+        index_resources(resource_ids, refresh=True)
 
         resp = self.client.get(search_url)
         self.assertEqual(resp.status_code, HTTP_200_OK)
@@ -310,6 +527,161 @@ class TestIndexing(SearchTestCase):
             len(resource_ids)
         )
 
+    def test_indexing_session(self):
+        """
+        A bulk indexing session pauses refreshes, and refreshes once at
+        the end if it was asked to.
+        """
+        conn = get_conn()
+
+        def get_index_settings():
+            """Settings changed by the session."""
+            return list(conn.indices.get_settings(
+                index=INDEX_NAME).values())[0]["settings"]["index"]
+
+        original_replicas = get_index_settings()["number_of_replicas"]
+        resource_ids = [self.resource.id] * 3
+        with mock.patch('search.utils._refresh_index') as refresh:
+            with indexing_session(bulk=True, drop_replicas=True):
+                index_resources(resource_ids, chunk_size=1)
+                index_resources(resource_ids, chunk_size=1, refresh=True)
+                index_settings = get_index_settings()
+                self.assertEqual(index_settings["refresh_interval"], "-1")
+                self.assertEqual(index_settings["number_of_replicas"], "0")
+                self.assertEqual(refresh.delay.call_count, 0)
+            self.assertEqual(refresh.delay.call_count, 1)
+
+            # Without a refresh the changes wait for the periodic one.
+            with indexing_session():
+                index_resources(resource_ids, chunk_size=1)
+            index_resources(resource_ids)
+            self.assertEqual(refresh.delay.call_count, 1)
+        index_settings = get_index_settings()
+        self.assertEqual(index_settings["refresh_interval"], "1s")
+        self.assertEqual(
+            index_settings["number_of_replicas"], original_replicas)
+
+    def test_recreate_index_swaps_alias(self):
+        """
+        recreate_index builds a new index and moves the alias to it.
+        """
+        conn = get_conn()
+        old_indices = list(conn.indices.get_alias(name=INDEX_NAME))
+        self.assertEqual(self.count_results(), 1)
+
+        recreate_index()
+        new_indices = list(conn.indices.get_alias(name=INDEX_NAME))
+        self.assertEqual(len(new_indices), 1)
+        self.assertNotIn(new_indices[0], old_indices)
+        for old_index in old_indices:
+            self.assertFalse(conn.indices.exists(old_index))
+        self.assertFalse(RebuildingIndex.objects.exists())
+        self.assertEqual(self.count_results(), 1)
+
+    def test_recreate_index_stale_rebuilds(self):
+        """
+        Indices left by rebuilds which died stop being written to once
+        they're gone, and are forgotten when a rebuild is swapped in.
+        """
+        conn = get_conn()
+        left_index = "{index}_vleft".format(index=INDEX_NAME)
+        conn.indices.create(left_index)
+        RebuildingIndex.objects.create(index_name=left_index)
+        RebuildingIndex.objects.create(
+            index_name="{index}_vdeleted".format(index=INDEX_NAME))
+
+        new_index, _ = start_recreate_index()
+        self.assertEqual(
+            sorted(RebuildingIndex.objects.values_list(
+                "index_name", flat=True)),
+            sorted([left_index, new_index])
+        )
+
+        recreate_index()
+        self.assertFalse(RebuildingIndex.objects.exists())
+        self.assertFalse(conn.indices.exists(left_index))
+        self.assertFalse(conn.indices.exists(new_index))
+
+    def test_resource_id_ranges(self):
+        """Resource ids are split into ranges covering all of them."""
+        resources = [self.resource] + [
+            self.create_resource(
+                course=self.course,
+                parent=None,
+                resource_type="example",
+                title="example {0}".format(i),
+                content_xml="<blah>{0}</blah>".format(i),
+                mpath="/blah{0}".format(i),
+            )
+            for i in range(4)
+        ]
+        ids = sorted(resource.id for resource in resources)
+        ranges = resource_id_ranges(2)
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges[0][0], ids[0])
+        self.assertEqual(ranges[-1][1], ids[-1] + 1)
+        self.assertEqual(
+            sorted(
+                resource_id for resource_id in ids
+                for start_id, end_id in ranges
+                if start_id <= resource_id < end_id
+            ),
+            ids
+        )
+
+    @override_settings(REINDEX_PARTITION_SIZE=1, REINDEX_BULK_DOCS=1)
+    def test_recreate_index_task(self):
+        """
+        The Celery task indexes every range of resources and swaps in
+        the new index.
+        """
+        for i in range(3):
+            self.create_resource(
+                course=self.course,
+                parent=None,
+                resource_type="example",
+                title="example {0}".format(i),
+                content_xml="<blah>{0}</blah>".format(i),
+                mpath="/blah{0}".format(i),
+            )
+        conn = get_conn()
+        old_indices = list(conn.indices.get_alias(name=INDEX_NAME))
+        recreate_index_task.delay()
+        self.assertNotEqual(
+            list(conn.indices.get_alias(name=INDEX_NAME)), old_indices)
+        self.assertEqual(self.count_results(), 4)
+        self.assertEqual(recreate_index(), 4)
+
+    def test_write_during_rebuild(self):
+        """
+        Changes made while an index is being rebuilt are written to both
+        the index in use and the new one.
+        """
+        conn = get_conn()
+        new_index, _ = start_recreate_index()
+        self.addCleanup(abandon_recreate_index, new_index)
+        with mock.patch.object(
+            conn.indices, 'get_alias', side_effect=conn.indices.get_alias
+        ) as get_alias:
+            self.resource.title = "changed during rebuild"
+            self.resource.save()
+        # Where to write comes from the database, not Elasticsearch.
+        self.assertFalse(get_alias.called)
+        conn.indices.refresh(index=new_index)
+        doc = conn.get(
+            index=new_index, doc_type="learningresource",
+            id=self.resource.id,
+        )
+        self.assertEqual(doc["_source"]["title"], "changed during rebuild")
+        self.assertEqual(self.count_results("rebuild"), 1)
+
+        self.resource.delete()
+        conn.indices.refresh(index=new_index)
+        self.assertFalse(conn.exists(
+            index=new_index, doc_type="learningresource",
+            id=self.resource.id,
+        ))
+
 
 class TestIndexFromScratch(LoreTestCase):
     """
@@ -3,9 +3,26 @@ from __future__ import unicode_literals
 
 import logging
 
-from search.search_indexes import get_course_metadata, get_vocabs, cache
+from django.test import override_settings
+import mock
+
+from learningresources.models import LearningResource
+from search.models import PendingReindex, ScheduledDrain
+from search.search_indexes import (
+    cache,
+    get_course_metadata,
+    get_label_version,
+    get_vocabs,
+)
 from search.sorting import LoreSortingFields
 from search.tests.base import SearchTestCase
+from search.utils import (
+    drain_reindex_queue,
+    index_resources,
+    refresh_index,
+    strip_xml,
+)
+from taxonomy.models import make_vocab_key
 
 log = logging.getLogger(__name__)
 
@@ -76,6 +93,41 @@ class TestIndexing(SearchTestCase):
         self.assertTrue(self.count_results("you're it") == 1)
         self.assertTrue(self.count_results("tag") == 0)
 
+    def test_stripped_content_stored(self):
+        """
+        Text is stripped when a resource is saved, and the stored text is
+        indexed without stripping it again.
+        """
+        self.resource.content_xml = "<tag>stored <b>text</b></tag>"
+        self.resource.save()
+        self.assertEqual(
+            LearningResource.objects.get(
+                id=self.resource.id).content_stripped,
+            "stored text"
+        )
+        with mock.patch('search.utils.strip_xml') as mock_strip:
+            index_resources([self.resource.id])
+            # Saving without changing the XML doesn't strip it again.
+            resource = LearningResource.objects.get(id=self.resource.id)
+            resource.title = "new title"
+            resource.save()
+        self.assertFalse(mock_strip.called)
+        self.assertEqual(self.count_results("stored"), 1)
+
+        # Resources saved before the text was stored are stripped as they
+        # are indexed.
+        LearningResource.objects.filter(id=self.resource.id).update(
+            content_xml="<tag>unstored</tag>", content_stripped=None)
+        index_resources([self.resource.id], refresh=True)
+        self.assertEqual(self.count_results("unstored"), 1)
+
+    def test_strip_xml_plain(self):
+        """Plain text, invalid XML and bytes are handled."""
+        self.assertEqual(strip_xml("plain & text"), "plain & text")
+        self.assertEqual(strip_xml("<a>broken"), "<a>broken")
+        self.assertEqual(strip_xml(b"<a>b&amp;c</a>"), "b&c")
+        self.assertEqual(strip_xml(""), "")
+
     def test_sorting(self):
         """Test sorting for search"""
         # remove the default resource to control the environment
@@ -203,13 +255,68 @@ class TestIndexing(SearchTestCase):
             return count
 
         set_cache_timeout(0)
-        with self.assertNumQueries(22):
+        with self.assertNumQueries(19):
             self.assertEqual(get_count(), 0)
 
         set_cache_timeout(60)
-        with self.assertNumQueries(20):
+        with self.assertNumQueries(17):
             self.assertEqual(get_count(), 1)
 
+    def test_index_chunk_queries(self):
+        """
+        Indexing a chunk of resources takes the same number of queries
+        however many resources are in it.
+        """
+        resource_ids = [self.resource.id] + [
+            self.create_resource(
+                course=self.course,
+                parent=None,
+                resource_type="example {0}".format(i),
+                title="example {0}".format(i),
+                content_xml="<blah>{0}</blah>".format(i),
+                mpath="/blah{0}".format(i),
+            ).id
+            for i in range(5)
+        ]
+        self.resource.terms.add(self.terms[0])
+
+        set_cache_timeout(0)
+        with self.assertNumQueries(4):
+            index_resources(resource_ids[:1])
+        with self.assertNumQueries(4):
+            index_resources(resource_ids)
+
+    def test_facet_label_cache(self):
+        """
+        Facet labels are cached under a version kept in the database, which
+        changes when a Term or Vocabulary changes.
+        """
+        self.resource.terms.add(self.terms[0])
+        set_cache_timeout(60)
+
+        def get_labels():
+            """Get the labels of the vocabulary facet and its values."""
+            facet = self.search("").aggregations()[
+                make_vocab_key(self.vocabulary.id)]
+            return (
+                facet["facet"]["label"],
+                [value["label"] for value in facet["values"]]
+            )
+
+        self.assertEqual(get_labels(), ("difficulty", ["easy"]))
+        # Only the vocabularies of the repository and the label version
+        # are queried.
+        with self.assertNumQueries(2):
+            self.assertEqual(get_labels(), ("difficulty", ["easy"]))
+
+        version = get_label_version()
+        self.terms[0].label = "simple"
+        self.terms[0].save()
+        self.vocabulary.name = "level"
+        self.vocabulary.save()
+        self.assertEqual(get_label_version(), version + 2)
+        self.assertEqual(get_labels(), ("level", ["simple"]))
+
     def test_course_cache(self):
         """
         Test caching -- enabled and disabled -- for course metadata.
@@ -260,3 +367,70 @@ class TestIndexing(SearchTestCase):
         a LearningResource isn't tagged with any terms.
         """
         self.thrice()
+
+    @override_settings(REINDEX_DEFERRED=True)
+    def test_deferred_reindex(self):
+        """
+        Changes are queued once per resource and indexed when the
+        queue is drained.
+        """
+        search_text = "The quick brown fox."
+        with mock.patch('search.utils._drain_reindex_queue') as drain:
+            self.resource.content_xml = search_text
+            self.resource.save()
+            self.resource.save()
+            self.resource.terms.add(self.terms[0])
+        self.assertEqual(drain.apply_async.call_count, 1)
+        self.assertEqual(ScheduledDrain.objects.count(), 1)
+        self.assertEqual(
+            list(PendingReindex.objects.values_list(
+                "resource_id", flat=True)),
+            [self.resource.id]
+        )
+        self.assertEqual(self.count_results(search_text), 0)
+
+        self.assertEqual(drain_reindex_queue(), 1)
+        refresh_index()
+        self.assertEqual(self.count_results(search_text), 1)
+        self.assertEqual(PendingReindex.objects.count(), 0)
+        self.assertEqual(ScheduledDrain.objects.count(), 0)
+
+    @override_settings(REINDEX_DEFERRED=True)
+    def test_deferred_reindex_requeue(self):
+        """
+        Resources queued again while they're being indexed are indexed
+        again rather than dequeued.
+        """
+        with mock.patch('search.utils._drain_reindex_queue') as drain:
+            self.resource.save()
+
+            def change_resource(*args):
+                """Change the resource while the first chunk is indexed."""
+                if index_mock.call_count == 1:
+                    self.resource.save()
+                return index_resources(*args)
+
+            with mock.patch(
+                'search.utils.index_resources', side_effect=change_resource
+            ) as index_mock:
+                self.assertEqual(drain_reindex_queue(), 2)
+        self.assertEqual(index_mock.call_count, 2)
+        self.assertEqual(PendingReindex.objects.count(), 0)
+        # The drain released the claim, so the change scheduled another.
+        self.assertEqual(drain.apply_async.call_count, 2)
+
+    @override_settings(REINDEX_DEFERRED=True)
+    def test_deferred_reindex_failure(self):
+        """Queued resources are kept if indexing them fails."""
+        with mock.patch('search.utils._drain_reindex_queue'):
+            self.resource.save()
+        with mock.patch(
+            'search.utils.index_resources', side_effect=KeyError
+        ):
+            with self.assertRaises(KeyError):
+                drain_reindex_queue()
+        self.assertEqual(
+            list(PendingReindex.objects.values_list(
+                "resource_id", flat=True)),
+            [self.resource.id]
+        )
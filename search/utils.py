@@ -5,36 +5,86 @@ Search functions.
 from __future__ import unicode_literals
 
 from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import reduce
+import hashlib
+import json
 import logging
 from itertools import islice  # pylint: disable=no-name-in-module
+import operator
+from multiprocessing import Pool
+import threading
+import time
+from uuid import uuid4
 
 from lxml import etree
 
+from django import db
 from django.conf import settings
-from elasticsearch.helpers import bulk
-from elasticsearch.exceptions import NotFoundError
-from elasticsearch_dsl import Search, Mapping, query
+from django.core.cache import caches
+from django.db import IntegrityError, models, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from elasticsearch.connection import Urllib3HttpConnection
+from elasticsearch.helpers import bulk, streaming_bulk
+from elasticsearch.exceptions import (
+    ConnectionError as ESConnectionError,
+    ConnectionTimeout,
+    NotFoundError,
+)
+from elasticsearch_dsl import F, Search, Mapping, query
 from elasticsearch_dsl.connections import connections
+from elasticsearch_dsl.result import Response
 
 from statsd.defaults.django import statsd
 
 from learningresources.models import get_preview_url, LearningResource
 from rest.serializers import RepositorySearchSerializer
 from search.exceptions import ReindexException
-from search.search_indexes import get_course_metadata
+from search.models import PendingReindex, RebuildingIndex, ScheduledDrain
+from search.search_indexes import (
+    get_course_metadata,
+    get_courses_metadata,
+    get_label_version,
+    get_term_labels,
+    get_vocabulary_labels,
+)
 from search.sorting import LoreSortingFields
-from search.tasks import refresh_index as _refresh_index
-from taxonomy.models import Vocabulary, Term, make_vocab_key
+from search.tasks import (
+    drain_reindex_queue as _drain_reindex_queue,
+    refresh_index as _refresh_index,
+)
+from taxonomy.models import Vocabulary, make_vocab_key
 
 log = logging.getLogger(__name__)
 
 DOC_TYPE = "learningresource"
+# Alias pointing to the index searches currently use
 INDEX_NAME = settings.HAYSTACK_CONNECTIONS["default"]["INDEX_NAME"]
 URL = settings.HAYSTACK_CONNECTIONS["default"]["URL"]
 _CONN = None
-_CONN_VERIFIED = False
+# time.time() when get_conn last found the index ready to use
+_CONN_VERIFIED = 0
+# Requests which BackoffConnection retries after timing out
+READ_METHODS = ("GET", "HEAD")
+# Seconds between looking for other nodes, if sniffing is on
+SNIFF_INTERVAL = 60
 PAGE_LENGTH = 10
+# Hits per request when iterating over all results, and how long
+# Elasticsearch keeps the scroll open between requests
+SCROLL_PAGE_LENGTH = 500
+SCROLL_TIMEOUT = "1m"
+# Resources sent to Elasticsearch per bulk request
+INDEX_CHUNK_SIZE = 100
 META_FIELDS_IN_RESULT = ('score',)
+# Index settings used between bulk indexing sessions
+DEFAULT_REFRESH_INTERVAL = "1s"
+SEARCH_GENERATION_KEY = "search_index_generation"
+# Tracks indexing sessions open in the current thread
+_SESSION = threading.local()
+# Vocabulary keys known to be in the mapping, by index name
+_MAPPED_VOCAB_KEYS = {}
 
 
 def get_vocab_ids(repo_slug=None):
@@ -46,56 +96,133 @@ def get_vocab_ids(repo_slug=None):
         return Vocabulary.objects.all().values_list('id', flat=True)
 
 
+class BackoffConnection(Urllib3HttpConnection):
+    """
+    HTTP connection to Elasticsearch which retries requests that fail to
+    connect or time out, waiting twice as long before each retry.
+
+    The client's own retries don't wait at all, and with a single host
+    there is no other node to fail over to.
+
+    Writes which time out aren't retried, since Elasticsearch may still be
+    working on them and a large bulk request would likely time out again.
+    """
+    def perform_request(self, method, *args, **kwargs):
+        """
+        Perform the request, retrying up to settings.ES_MAX_RETRIES times
+        within settings.ES_MAX_RETRY_TIME seconds.
+        """
+        started = time.time()
+        attempt = 0
+        while True:
+            try:
+                return super(BackoffConnection, self).perform_request(
+                    method, *args, **kwargs)
+            except ESConnectionError as ex:
+                # Timeouts are a kind of ESConnectionError.
+                if (
+                        isinstance(ex, ConnectionTimeout) and
+                        method not in READ_METHODS
+                ):
+                    raise
+                delay = self._retry_delay(started, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _retry_delay(started, attempt):
+        """
+        Seconds to wait before retrying, or None if there's no retry left.
+
+        Args:
+            started (float): time.time() when the request was first tried
+            attempt (int): Number of retries so far
+        """
+        delay = settings.ES_RETRY_BACKOFF * 2 ** attempt
+        if (
+                attempt >= settings.ES_MAX_RETRIES or
+                time.time() + delay - started > settings.ES_MAX_RETRY_TIME
+        ):
+            return None
+        return delay
+
+
 def get_conn(verify=True):
     """
     Lazily create the connection.
+
+    HTTP connections are pooled and kept alive, and failed requests are
+    retried, according to the ES_* settings. With verify, the index and
+    mapping are checked before the connection is returned. A successful
+    check is trusted for settings.ES_VERIFY_TTL seconds.
+
+    Args:
+        verify (bool): Make sure the index is ready to use
+    Returns:
+        elasticsearch.Elasticsearch: The connection
+    Raises:
+        ReindexException: The index or its mapping is missing
     """
     # pylint: disable=global-statement
     # This is ugly. Any suggestions on a way that doesn't require "global"?
     global _CONN
     global _CONN_VERIFIED
 
-    do_verify = False
     if _CONN is None:
-        _CONN = connections.create_connection(hosts=[URL])
-        # Verify connection on first connect if verify=True.
-        do_verify = verify
-
-    if verify and not _CONN_VERIFIED:
-        # If we have a connection but haven't verified before, do it now.
-        do_verify = True
-
-    if not do_verify:
-        if not verify:
-            # We only skip verification if we're reindexing or
-            # deleting the index. Make sure we verify next time we connect.
-            _CONN_VERIFIED = False
+        _CONN = connections.create_connection(
+            hosts=[URL],
+            connection_class=BackoffConnection,
+            maxsize=settings.ES_POOL_SIZE,
+            timeout=settings.ES_TIMEOUT,
+            # BackoffConnection does the retrying.
+            max_retries=0,
+            sniff_on_start=settings.ES_SNIFF,
+            sniff_on_connection_fail=settings.ES_SNIFF,
+            sniffer_timeout=SNIFF_INTERVAL if settings.ES_SNIFF else None,
+        )
+
+    if not verify or (
+            time.time() - _CONN_VERIFIED < settings.ES_VERIFY_TTL):
         return _CONN
 
-    # Make sure everything exists.
-    if not _CONN.indices.exists(INDEX_NAME):
+    # Make sure everything exists. The mapping is keyed by the index the
+    # alias points to.
+    try:
+        mapping = _CONN.indices.get_mapping(index=INDEX_NAME)
+    except NotFoundError:
         raise ReindexException("Unable to find index {index_name}".format(
             index_name=INDEX_NAME
         ))
 
-    mapping = _CONN.indices.get_mapping()
-    if INDEX_NAME not in mapping:
+    if len(mapping) == 0:
         raise ReindexException(
             "No mappings found in index {index_name}".format(
                 index_name=INDEX_NAME
             )
         )
 
-    mappings = _CONN.indices.get_mapping()[INDEX_NAME]["mappings"]
+    mappings = list(mapping.values())[0]["mappings"]
     if DOC_TYPE not in mappings.keys():
         raise ReindexException("Mapping {doc_type} not found".format(
             doc_type=DOC_TYPE
         ))
 
-    _CONN_VERIFIED = True
+    _CONN_VERIFIED = time.time()
     return _CONN
 
 
+def _reset_verification():
+    """
+    Check the index again next time get_conn is called, because it has
+    been changed or removed.
+    """
+    # pylint: disable=global-statement
+    global _CONN_VERIFIED
+    _CONN_VERIFIED = 0
+
+
 def get_resource_terms(resource_ids):
     """
     Returns taxonomy metadata for LearningResources.
@@ -146,7 +273,7 @@ def search_index(tokens=None, repo_slug=None, sort_by=None, terms=None):
 
     search = Search(index=INDEX_NAME, doc_type=DOC_TYPE)
 
-    # Limit returned fields since content_xml can be huge and is unnecessary.
+    # Limit returned fields to the ones in the search results.
     search = search.fields(_get_field_names())
 
     if tokens is not None:
@@ -155,19 +282,19 @@ def search_index(tokens=None, repo_slug=None, sort_by=None, terms=None):
             query=tokens, fields=["title", "description", "content_stripped"])
         search = search.query(multi)
 
-    # Filter further on taxonomy terms.
-    for key, value in terms.items():
+    # Filter further on taxonomy terms. These and the repository are exact
+    # restrictions which shouldn't affect scoring, so they're filters:
+    # Elasticsearch can cache them and skip scoring them.
+    for key, value in sorted(terms.items()):
         if value is None:
-            search = search.query(
-                "query_string",
-                query="_missing_:({key})".format(key=key)
-            )
+            search = search.filter(
+                "bool", must_not=[F("exists", field=key)])
         else:
-            search = search.query("match", **{key: value})
+            search = search.filter("term", **{key: value})
 
     if repo_slug is not None:
         # Filter further on repository.
-        search = search.query("match", repository=repo_slug)
+        search = search.filter("term", repository=repo_slug)
     if sort_by is None:
         # Always sort by ID to preserve ordering.
         search = search.sort(LoreSortingFields.BASE_SORTING_FIELD)
@@ -217,36 +344,168 @@ def search_index(tokens=None, repo_slug=None, sort_by=None, terms=None):
 
 
 @statsd.timer('lore.elasticsearch.bulk_index_chunk')
-def _index_resource_chunk(resource_ids):
-    """Add/update records in Elasticsearch."""
+def _index_resource_chunk(resource_ids, index_names):
+    """
+    Add/update records in Elasticsearch.
 
-    # Terms assigned to the resources.
-    term_info = get_resource_terms(resource_ids)
+    Args:
+        resource_ids (list of int): LearningResource ids to index
+        index_names (list of unicode): Indices to write the records to
+    Returns:
+        int: Number of records written to the last index
+    """
 
-    ensure_vocabulary_mappings(term_info)
+    term_info, docs = _resource_docs(resource_ids)
 
     # Perform bulk insert using Elasticsearch directly.
     conn = get_conn()
-    resources = LearningResource.objects.filter(id__in=resource_ids).iterator()
-    insert_count, errors = bulk(
-        conn,
-        (resource_to_dict(x, term_info[x.id]) for x in resources),
-        index=INDEX_NAME,
-        doc_type=DOC_TYPE,
-    )
+    insert_count = 0
+    for index_name in index_names:
+        ensure_vocabulary_mappings(term_info, index_name)
+        insert_count, errors = bulk(
+            conn,
+            docs,
+            index=index_name,
+            doc_type=DOC_TYPE,
+        )
 
-    if errors != []:
-        raise ReindexException("Error during bulk insert: {errors}".format(
-            errors=errors
-        ))
-    refresh_index()
+        if errors != []:
+            raise ReindexException(
+                "Error during bulk insert: {errors}".format(errors=errors))
+    bump_index_generation()
 
     return insert_count
 
 
+def _resource_docs(resource_ids):
+    """
+    Build the Elasticsearch documents for some resources.
+
+    Everything the documents need is fetched up front, so this takes the
+    same number of queries however many resources there are.
+
+    Args:
+        resource_ids (list of int): LearningResource ids
+    Returns:
+        term_info (dict): Output of get_resource_terms for the resources
+        docs (list of dict): Output of resource_to_dict for each resource
+    """
+    # Terms assigned to the resources.
+    term_info = get_resource_terms(resource_ids)
+    resources = list(LearningResource.objects.filter(
+        id__in=resource_ids
+    ).select_related("learning_resource_type"))
+    courses = get_courses_metadata(x.course_id for x in resources)
+    return term_info, [
+        resource_to_dict(x, term_info[x.id], courses[x.course_id])
+        for x in resources
+    ]
+
+
+def _write_indices():
+    """
+    Indices which changes to resources must be written to.
+
+    While recreate_index is building a new index, changes are written to
+    it as well as to the one in use so they aren't lost when it is swapped
+    in. The indices being rebuilt are recorded in the database, so every
+    process knows about them without asking Elasticsearch on each write.
+
+    Returns:
+        list of unicode: Index names or aliases
+    """
+    return [INDEX_NAME] + list(RebuildingIndex.objects.order_by(
+        "id").values_list("index_name", flat=True))
+
+
+def _session_depth():
+    """Number of indexing sessions open in the current thread."""
+    return getattr(_SESSION, "depth", 0)
+
+
+def _get_index_settings(conn, index_name):
+    """
+    Look up the index settings changed during bulk indexing sessions.
+
+    Args:
+        conn (elasticsearch.Elasticsearch): Connection
+        index_name (unicode): Index or alias
+    Returns:
+        dict: refresh_interval and number_of_replicas for the index
+    """
+    # The result is keyed by the concrete index name.
+    index_settings = list(
+        conn.indices.get_settings(index=index_name).values()
+    )[0]["settings"]["index"]
+    refresh_interval = index_settings.get(
+        "refresh_interval", DEFAULT_REFRESH_INTERVAL)
+    if refresh_interval == "-1":
+        # Left paused by a session which didn't finish. Don't keep it.
+        refresh_interval = DEFAULT_REFRESH_INTERVAL
+    return {
+        "refresh_interval": refresh_interval,
+        "number_of_replicas": index_settings.get("number_of_replicas", "1"),
+    }
+
+
+@contextmanager
+def indexing_session(bulk=False, drop_replicas=False, refresh=False):
+    """
+    Group indexing work so the index is refreshed at most once at the end.
+
+    Calls to refresh_index() inside the session are put off until it ends.
+    Sessions may be nested, in which case only the outermost one pauses
+    or refreshes the index.
+
+    Args:
+        bulk (bool): Also pause Elasticsearch's periodic refresh until the
+            session ends. Meant for reindexing a lot of resources; the
+            settings call isn't worth it for a handful.
+        drop_replicas (bool): With bulk, also drop replicas until the
+            session ends so documents are only indexed once.
+        refresh (bool): Refresh at the end of the session so the changes
+            are visible to searches right away. Otherwise they show up
+            after Elasticsearch's next periodic refresh.
+    """
+    depth = _session_depth()
+    if depth == 0:
+        _SESSION.refresh = False
+    if refresh:
+        _SESSION.refresh = True
+    _SESSION.depth = depth + 1
+    original_settings = None
+    try:
+        if depth == 0 and bulk:
+            conn = get_conn()
+            original_settings = _get_index_settings(conn, INDEX_NAME)
+            paused_settings = {"refresh_interval": "-1"}
+            if drop_replicas:
+                paused_settings["number_of_replicas"] = 0
+            conn.indices.put_settings(
+                index=INDEX_NAME, body={"index": paused_settings})
+        yield
+    finally:
+        _SESSION.depth = depth
+        if original_settings is not None:
+            get_conn().indices.put_settings(
+                index=INDEX_NAME, body={"index": original_settings})
+    if depth == 0 and _SESSION.refresh:
+        refresh_index()
+
+
 @statsd.timer('lore.elasticsearch.bulk_index')
-def index_resources(resource_ids, chunk_size=100):
-    """Add/update records in Elasticsearch."""
+def index_resources(resource_ids, chunk_size=INDEX_CHUNK_SIZE,
+                    on_chunk=None, refresh=False):
+    """
+    Add/update records in Elasticsearch.
+
+    Args:
+        resource_ids (iterable): LearningResource ids to index
+        chunk_size (int): Resources per bulk request
+        on_chunk (callable): Called with no arguments after each chunk
+        refresh (bool): Refresh the index afterwards so the changes are
+            visible to searches right away
+    """
 
     # Must be an iterator so islice doesn't pull the same n items each
     # time.
@@ -254,29 +513,204 @@ def index_resources(resource_ids, chunk_size=100):
 
     # Limit chunk size to 100 to avoid storing it all
     # in memory at once.
-    chunk = list(islice(resource_ids, chunk_size))
-    while len(chunk) > 0:
-        _index_resource_chunk(chunk)
+    index_names = _write_indices()
+    # Cached search responses are only dropped once a refresh has made
+    # the changes visible.
+    if settings.SEARCH_CACHE_ENABLED:
+        refresh = True
+    with indexing_session(refresh=refresh):
         chunk = list(islice(resource_ids, chunk_size))
+        while len(chunk) > 0:
+            _index_resource_chunk(chunk, index_names)
+            if on_chunk is not None:
+                on_chunk()
+            chunk = list(islice(resource_ids, chunk_size))
 
-    refresh_index()
+
+def queue_reindex(resource_ids):
+    """
+    Queue resources to be reindexed together by a Celery task.
+
+    Each resource is queued at most once, however many times it changes
+    before the queue is drained. The drain is scheduled
+    ``settings.REINDEX_QUEUE_DELAY`` seconds out so changes made in the
+    meantime are indexed in the same bulk requests. If
+    ``settings.REINDEX_DEFERRED`` is off the resources are indexed right
+    away instead.
+
+    Args:
+        resource_ids (iterable): LearningResource ids
+    """
+    resource_ids = list(resource_ids)
+    if not settings.REINDEX_DEFERRED:
+        # The change was made by this request, so show it in the response.
+        index_resources(resource_ids, refresh=True)
+        return
+
+    _add_to_reindex_queue(resource_ids)
+    # Only one drain needs to be waiting at a time.
+    if _claim_drain():
+        _drain_reindex_queue.apply_async(
+            countdown=settings.REINDEX_QUEUE_DELAY)
+
+
+def _claim_drain():
+    """
+    Claim the next drain of the reindex queue for this process.
+
+    A claim lapses after ``settings.REINDEX_QUEUE_DELAY`` seconds, when the
+    drain it scheduled should have started, and is released as soon as a
+    drain starts.
+
+    Returns:
+        bool: True if the caller should schedule a drain
+    """
+    now = timezone.now()
+    lapsed = now - timedelta(seconds=settings.REINDEX_QUEUE_DELAY)
+    if ScheduledDrain.objects.filter(
+            id=1, scheduled_at__lt=lapsed).update(scheduled_at=now) > 0:
+        return True
+    try:
+        with transaction.atomic():
+            ScheduledDrain.objects.create(id=1, scheduled_at=now)
+    except IntegrityError:
+        # Claimed by someone else.
+        return False
+    return True
+
+
+def drain_reindex_queue(chunk_size=INDEX_CHUNK_SIZE):
+    """
+    Reindex the resources in the reindex queue.
+
+    Ids are removed from the queue once they are indexed, unless they were
+    queued again in the meantime, so a failed drain loses nothing and
+    changes made while this runs are picked up. Also run periodically in
+    case a scheduled drain is lost.
+
+    Args:
+        chunk_size (int): Resources to take from the queue at a time
+    Returns:
+        int: Number of resources reindexed
+    """
+    # Changes queued from now on schedule a new drain.
+    ScheduledDrain.objects.all().delete()
+    count = 0
+    while True:
+        queued = list(PendingReindex.objects.order_by("id").values_list(
+            "id", "version", "resource_id")[:chunk_size])
+        if len(queued) == 0:
+            return count
+        resource_ids = [resource_id for _, _, resource_id in queued]
+        index_resources(resource_ids, chunk_size)
+        with transaction.atomic():
+            PendingReindex.objects.filter(reduce(operator.or_, (
+                Q(id=row_id, version=version)
+                for row_id, version, _ in queued
+            ))).delete()
+        count += len(resource_ids)
+
+
+def _add_to_reindex_queue(resource_ids):
+    """
+    Add resources to the reindex queue, skipping those already in it.
+
+    Args:
+        resource_ids (iterable): LearningResource ids
+    """
+    resource_ids = set(resource_ids)
+    queued = set(PendingReindex.objects.filter(
+        resource_id__in=resource_ids
+    ).values_list("resource_id", flat=True))
+    if len(queued) > 0:
+        # A drain indexing the old version mustn't dequeue these.
+        PendingReindex.objects.filter(resource_id__in=queued).update(
+            version=models.F("version") + 1)
+    for resource_id in resource_ids - queued:
+        try:
+            with transaction.atomic():
+                PendingReindex.objects.create(resource_id=resource_id)
+        except IntegrityError:
+            # Queued by someone else in the meantime.
+            pass
 
 
 @statsd.timer('lore.elasticsearch.delete_index')
 def delete_resource_from_index(resource):
-    """Delete a record from Elasticsearch."""
+    """
+    Delete a record from Elasticsearch.
+
+    Inside batched_index_deletes() the record is removed when the block
+    ends along with the others deleted there.
+
+    Args:
+        resource (LearningResource): Deleted resource
+    """
+    deleted_ids = getattr(_SESSION, "deleted_ids", None)
+    if deleted_ids is not None:
+        deleted_ids.append(resource.id)
+        return
+    delete_resources_from_index([resource.id])
+
+
+@statsd.timer('lore.elasticsearch.bulk_delete')
+def delete_resources_from_index(resource_ids):
+    """
+    Delete records from Elasticsearch in bulk requests, then refresh once.
+
+    Args:
+        resource_ids (iterable): Ids of deleted LearningResources
+    """
+    resource_ids = list(resource_ids)
+    if len(resource_ids) == 0:
+        return
     conn = get_conn()
+    errors = []
+    for index_name in _write_indices():
+        for success, item in streaming_bulk(
+                conn,
+                ({"_op_type": "delete", "_id": resource_id}
+                 for resource_id in resource_ids),
+                index=index_name,
+                doc_type=DOC_TYPE,
+                chunk_size=settings.REINDEX_BULK_DOCS,
+                raise_on_error=False,
+        ):
+            # We don't care about records that weren't in the index;
+            # the desired outcome is identical.
+            if not success and item["delete"].get("status") != 404:
+                errors.append(item)
+    refresh_index()
+    if errors != []:
+        raise ReindexException("Error during bulk delete: {errors}".format(
+            errors=errors
+        ))
+
+
+@contextmanager
+def batched_index_deletes():
+    """
+    Remove resources deleted inside the block from the index together.
+
+    Deleting a course cascades to all of its LearningResources and
+    post_delete is sent for each of them. Instead of one request and
+    refresh per resource, their ids are collected and removed in bulk
+    when the block ends. Nothing is removed if the block raises.
+    Blocks may be nested, in which case the outermost one does the work.
+    """
+    if getattr(_SESSION, "deleted_ids", None) is not None:
+        yield
+        return
+    _SESSION.deleted_ids = []
     try:
-        conn.delete(
-            index=INDEX_NAME, doc_type=DOC_TYPE, id=resource.id)
-        refresh_index()
-    except NotFoundError:
-        # We tried to delete something that wasn't in the index.
-        # In that case, we don't care; the desired outcome is identical.
-        pass
+        yield
+        deleted_ids = _SESSION.deleted_ids
+    finally:
+        _SESSION.deleted_ids = None
+    delete_resources_from_index(deleted_ids)
 
 
-def resource_to_dict(resource, term_info):
+def resource_to_dict(resource, term_info, course=None):
     """
     Retrieve important values from a LearningResource to index.
 
@@ -289,6 +723,8 @@ def resource_to_dict(resource, term_info):
     Args:
         resource (LearningResource): Item to convert to dict.
         term_info (dict): Vocabulary terms assigned to resource.
+        course (dict): Output of get_course_metadata for the resource's
+            course, if it has been looked up already.
     Returns:
         rec (dict): Dictionary representation of the LearningResource.
     """
@@ -302,15 +738,16 @@ def resource_to_dict(resource, term_info):
         "resource_type": resource.learning_resource_type.name,
         "description": resource.description,
         "description_path": resource.description_path,
-        "content_xml": resource.content_xml,
-        "content_stripped": strip_xml(resource.content_xml),
+        # Only the text is searched, so the XML itself isn't sent.
+        "content_stripped": resource.content_stripped,
         "xa_nr_views": resource.xa_nr_views,
         "xa_nr_attempts": resource.xa_nr_attempts,
         "xa_avg_grade": resource.xa_avg_grade,
         "xa_histogram_grade": resource.xa_histogram_grade,
     }
 
-    course = get_course_metadata(resource.course_id)
+    if course is None:
+        course = get_course_metadata(resource.course_id)
     rec["preview_url"] = get_preview_url(
         resource,
         org=course["org"],
@@ -320,6 +757,9 @@ def resource_to_dict(resource, term_info):
     rec["run"] = course["run"]
     rec["course"] = course["course_number"]
     rec["repository"] = course["repo_slug"]
+    if rec["content_stripped"] is None:
+        # Not worked out when the resource was saved.
+        rec["content_stripped"] = strip_xml(resource.content_xml)
 
     # Index term info. Since these fields all use the "not_analyzed"
     # index, they must all be exact matches.
@@ -332,7 +772,7 @@ def resource_to_dict(resource, term_info):
 
     # Keys that may have unicode issues.
     text_keys = (
-        'title', 'titlesort', 'resource_type', 'description', 'content_xml',
+        'title', 'titlesort', 'resource_type', 'description',
         'content_stripped', 'description_path',
     )
     for key in text_keys:
@@ -348,26 +788,291 @@ def resource_to_dict(resource, term_info):
     return rec
 
 
+def _versioned_indices(conn):
+    """
+    Names of the indices created by recreate_index.
+
+    Args:
+        conn (elasticsearch.Elasticsearch): Connection
+    Returns:
+        list of unicode: Index names
+    """
+    return list(conn.indices.get_settings(
+        index="{index}_v*".format(index=INDEX_NAME)
+    ))
+
+
 def remove_index():
     """
     Delete the index.
     """
     conn = get_conn(verify=False)
+    index_names = set(_versioned_indices(conn))
     if conn.indices.exists(INDEX_NAME):
-        conn.indices.delete(INDEX_NAME)
+        # Either the index itself or the one the alias points to.
+        index_names.update(conn.indices.get_settings(index=INDEX_NAME))
+    RebuildingIndex.objects.all().delete()
+    for index_name in index_names:
+        conn.indices.delete(index_name)
+    _reset_verification()
+    clear_vocabulary_mapping_cache()
+    bump_index_generation()
+
+
+def recreate_index(workers=1):
+    """
+    Build a new index with all resources and swap it in.
+
+    Resources are loaded into a new timestamped index, which then replaces
+    the one behind the INDEX_NAME alias in a single alias update. Searches
+    keep using the old index until then, and it is deleted afterwards.
+
+    The resources are split into ranges of ids which are indexed by a pool
+    of worker processes. search.tasks.recreate_index does the same using
+    Celery workers.
+
+    Args:
+        workers (int): Number of processes indexing resources. With 1,
+            everything is indexed in this process.
+    Returns:
+        int: Number of resources indexed
+    """
+    started = time.time()
+    new_index, live_settings = start_recreate_index()
+    try:
+        ranges = resource_id_ranges()
+        if workers > 1:
+            count = _index_ranges_in_pool(ranges, new_index, workers)
+        else:
+            count = sum(
+                index_resource_range(start_id, end_id, new_index)
+                for start_id, end_id in ranges
+            )
+    except Exception:
+        abandon_recreate_index(new_index)
+        raise
+    return finish_recreate_index(new_index, live_settings, count, started)
 
 
-def recreate_index():
-    """Wipe and recreate index and mapping, and index all resources."""
+def start_recreate_index():
+    """
+    Create the index for recreate_index to load resources into.
+
+    Refreshes and replicas are turned off on the new index until
+    finish_recreate_index swaps it in.
+
+    Returns:
+        new_index (unicode): Name of the new index
+        live_settings (dict): Settings to give the index once it's loaded
+    """
+    conn = get_conn(verify=False)
+    if conn.indices.exists(INDEX_NAME):
+        live_settings = _get_index_settings(conn, INDEX_NAME)
+    else:
+        live_settings = {"refresh_interval": DEFAULT_REFRESH_INTERVAL}
+    new_index = "{index}_v{timestamp}".format(
+        index=INDEX_NAME,
+        timestamp=datetime.utcnow().strftime("%Y%m%d%H%M%S%f"),
+    )
+    conn.indices.create(new_index, body={"settings": {"index": {
+        "refresh_interval": "-1",
+        "number_of_replicas": 0,
+    }}})
+    _create_mapping(conn, new_index)
+    # Forget indices left by rebuilds which died and were cleaned up since,
+    # so writes don't recreate them.
+    for index_name in RebuildingIndex.objects.values_list(
+            "index_name", flat=True):
+        if not conn.indices.exists(index_name):
+            RebuildingIndex.objects.filter(index_name=index_name).delete()
+    # Resources which change during the rebuild are written here as well.
+    RebuildingIndex.objects.create(index_name=new_index)
+    if not conn.indices.exists(INDEX_NAME):
+        # Nothing to keep searchable, so use the new index right away.
+        conn.indices.put_alias(index=new_index, name=INDEX_NAME)
+    return new_index, live_settings
+
+
+def finish_recreate_index(new_index, live_settings, count, started):
+    """
+    Swap in an index loaded by recreate_index.
+
+    Args:
+        new_index (unicode): Index from start_recreate_index
+        live_settings (dict): Settings from start_recreate_index
+        count (int): Number of resources indexed
+        started (float): time.time() when the rebuild started
+    Returns:
+        int: Number of resources indexed
+    """
     conn = get_conn(verify=False)
-    remove_index()
-    conn.indices.create(INDEX_NAME)
-    conn.indices.refresh()
+    conn.indices.put_settings(index=new_index, body={"index": live_settings})
+    conn.indices.refresh(index=new_index)
+    _swap_index(conn, new_index)
+
+    elapsed = time.time() - started
+    rate = count / elapsed if elapsed > 0 else 0
+    statsd.gauge('lore.elasticsearch.reindex_rate', rate)
+    log.info(
+        "Reindexed %d resources in %.1f seconds (%.1f per second)",
+        count, elapsed, rate
+    )
+    return count
 
-    create_mapping()
 
-    # re-index all existing LearningResource instances:
-    index_resources(LearningResource.objects.values_list("id", flat=True))
+def abandon_recreate_index(new_index):
+    """
+    Delete an index left by a rebuild which failed.
+
+    Args:
+        new_index (unicode): Index from start_recreate_index
+    """
+    RebuildingIndex.objects.filter(index_name=new_index).delete()
+    get_conn(verify=False).indices.delete(new_index)
+
+
+def resource_id_ranges(partition_size=None):
+    """
+    Split the LearningResource ids into ranges for recreate_index.
+
+    Args:
+        partition_size (int): Ids per range. Defaults to
+            settings.REINDEX_PARTITION_SIZE.
+    Returns:
+        list of tuple: (start_id, end_id) for each range, end excluded
+    """
+    if partition_size is None:
+        partition_size = settings.REINDEX_PARTITION_SIZE
+    bounds = LearningResource.objects.aggregate(Min("id"), Max("id"))
+    if bounds["id__min"] is None:
+        return []
+    end = bounds["id__max"] + 1
+    return [
+        (start_id, min(start_id + partition_size, end))
+        for start_id in range(bounds["id__min"], end, partition_size)
+    ]
+
+
+@statsd.timer('lore.elasticsearch.index_resource_range')
+def index_resource_range(start_id, end_id, index_name=INDEX_NAME):
+    """
+    Index the resources with ids in a range into one index.
+
+    Documents are streamed to Elasticsearch in bulk requests of at most
+    settings.REINDEX_BULK_DOCS documents and settings.REINDEX_BULK_BYTES
+    bytes.
+
+    Args:
+        start_id (int): First LearningResource id in the range
+        end_id (int): Id after the last one in the range
+        index_name (unicode): Index to write to
+    Returns:
+        int: Number of resources indexed
+    """
+    resource_ids = LearningResource.objects.filter(
+        id__gte=start_id, id__lt=end_id
+    ).order_by("id").values_list("id", flat=True).iterator()
+
+    def generate_docs():
+        """Build documents a chunk of resources at a time."""
+        chunk = list(islice(resource_ids, INDEX_CHUNK_SIZE))
+        while len(chunk) > 0:
+            term_info, docs = _resource_docs(chunk)
+            ensure_vocabulary_mappings(term_info, index_name)
+            for doc in docs:
+                yield doc
+            chunk = list(islice(resource_ids, INDEX_CHUNK_SIZE))
+
+    count = 0
+    errors = []
+    for success, item in streaming_bulk(
+            get_conn(),
+            generate_docs(),
+            index=index_name,
+            doc_type=DOC_TYPE,
+            chunk_size=settings.REINDEX_BULK_DOCS,
+            max_chunk_bytes=settings.REINDEX_BULK_BYTES,
+            raise_on_error=False,
+    ):
+        if success:
+            count += 1
+        else:
+            errors.append(item)
+    if errors != []:
+        raise ReindexException("Error during bulk insert: {errors}".format(
+            errors=errors
+        ))
+    return count
+
+
+def _index_ranges_in_pool(ranges, index_name, workers):
+    """
+    Index ranges of resources on a pool of processes.
+
+    Args:
+        ranges (list of tuple): Output of resource_id_ranges
+        index_name (unicode): Index to write to
+        workers (int): Number of processes
+    Returns:
+        int: Number of resources indexed
+    """
+    # The processes must not share this one's connections.
+    for connection in db.connections.all():
+        connection.close()
+    pool = Pool(workers, initializer=_reset_conn)
+    try:
+        return sum(pool.imap_unordered(_index_range_in_pool, [
+            (start_id, end_id, index_name) for start_id, end_id in ranges
+        ]))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _index_range_in_pool(args):
+    """Call index_resource_range in a pool process."""
+    return index_resource_range(*args)
+
+
+def _reset_conn():
+    """Make a pool process open its own Elasticsearch connection."""
+    # pylint: disable=global-statement
+    global _CONN
+    global _CONN_VERIFIED
+    _CONN = None
+    _CONN_VERIFIED = 0
+
+
+def _swap_index(conn, new_index):
+    """
+    Point the INDEX_NAME alias at new_index and delete the old indices.
+
+    Args:
+        conn (elasticsearch.Elasticsearch): Connection
+        new_index (unicode): Index built by recreate_index
+    """
+    actions = []
+    if conn.indices.exists_alias(name=INDEX_NAME):
+        for old_index in conn.indices.get_alias(name=INDEX_NAME):
+            if old_index != new_index:
+                actions.append(
+                    {"remove": {"index": old_index, "alias": INDEX_NAME}})
+    elif conn.indices.exists(INDEX_NAME):
+        # An index created before INDEX_NAME became an alias. It has to go
+        # before the alias can take its name.
+        conn.indices.delete(INDEX_NAME)
+    actions.append({"add": {"index": new_index, "alias": INDEX_NAME}})
+    conn.indices.update_aliases(body={"actions": actions})
+    # Every other versioned index is about to be deleted, including any
+    # left by a rebuild which never finished.
+    RebuildingIndex.objects.all().delete()
+    _reset_verification()
+    clear_vocabulary_mapping_cache()
+    bump_index_generation()
+
+    for old_index in _versioned_indices(conn):
+        if old_index != new_index:
+            conn.indices.delete(old_index)
 
 
 class SearchResults(object):
@@ -376,18 +1081,63 @@ class SearchResults(object):
 
     This is because the actual search result has nested types, which
     would be cumbersome to access from arbitrary calling functions.
+
+    The total, the aggregations and one window of hits are fetched together
+    in a single request the first time any of them is needed. Hits outside
+    that window are fetched separately.
     """
     def __init__(self, search):
         """Get raw search result from Elasticsearch."""
         self._search = search
+        self._window = (0, PAGE_LENGTH)
+        self._response = None
+        self._cached_hits = None
         self._cached_agg = None
         self._cached_count = None
         get_conn()  # We don't need the return value; just for it to exist.
 
+    def prefetch(self, start, end):
+        """
+        Choose the hits fetched along with the total and aggregations.
+
+        Has no effect once the request has been made.
+
+        Args:
+            start (int): Index of the first hit
+            end (int): Index after the last hit
+        """
+        if self._response is None:
+            self._window = (start, end)
+
+    def _execute(self):
+        """Fetch the total, aggregations and window of hits at once."""
+        if self._response is None:
+            start, end = self._window
+            self._response = _execute_cached(self._search[start:end])
+            self._cached_count = self._response.hits.total
+            self._cached_hits = _flatten_hits(self._response.hits)
+        return self._response
+
+    def _window_hits(self, start, end):
+        """
+        Return hits from the first request if they cover a slice.
+
+        Args:
+            start (int): Index of the first hit
+            end (int): Index after the last hit
+        Returns:
+            list: The hits, or None if they weren't all fetched
+        """
+        window_start, window_end = self._window
+        if start < window_start or end > window_end:
+            return None
+        self._execute()
+        return self._cached_hits[start - window_start:end - window_start]
+
     def count(self):
         """Total records matching the query."""
         if self._cached_count is None:
-            self._cached_count = self._search.count()
+            self._execute()
         return self._cached_count
 
     def page_count(self):
@@ -405,31 +1155,55 @@ class SearchResults(object):
         return self._search[start:end].execute().hits
 
     def all(self):
-        """Return all results in a generator."""
-        for i in range(self.page_count()):
-            for hit in self.get_page(i+1):
-                yield hit
+        """
+        Return all results in a generator.
+
+        Results are fetched as they are needed with a scroll, in the order
+        of the search, SCROLL_PAGE_LENGTH at a time.
+        """
+        conn = get_conn()
+        body = self._search[0:SCROLL_PAGE_LENGTH].to_dict()
+        # Aggregations aren't needed for every hit.
+        body.pop("aggs", None)
+        response = conn.search(
+            index=INDEX_NAME, doc_type=DOC_TYPE, body=body,
+            scroll=SCROLL_TIMEOUT,
+        )
+        scroll_id = response.get("_scroll_id")
+        try:
+            while len(response["hits"]["hits"]) > 0:
+                for hit in Response(response).hits:
+                    yield hit
+                response = conn.scroll(
+                    scroll_id=scroll_id, scroll=SCROLL_TIMEOUT)
+                scroll_id = response.get("_scroll_id")
+        finally:
+            # Free the scroll now rather than when it times out, including
+            # when the caller stops early.
+            if scroll_id is not None:
+                conn.clear_scroll(scroll_id=scroll_id)
 
     def aggregations(self):
         """Return aggregations."""
         if self._cached_agg is None:
-            self._cached_agg = self._search.params(
-                search_type="count").execute()
-        return convert_aggregate(vars(self._cached_agg.aggregations))
+            self._cached_agg = convert_aggregate(
+                vars(self._execute().aggregations))
+        return self._cached_agg
 
     def __getitem__(self, i):
         """Return result by index."""
         if isinstance(i, slice):
-            hits = self._search[i].execute().hits
+            start = i.start or 0
+            end = i.stop if i.stop is not None else start + PAGE_LENGTH
         else:
-            hits = self._search[slice(i, i+1)].execute().hits
+            start, end = i, i + 1
 
-        for hit in hits:
-            for field_name in _get_field_names():
-                if field_name not in META_FIELDS_IN_RESULT:
-                    setattr(hit, field_name, getattr(hit, field_name)[0])
-                else:
-                    setattr(hit, field_name, getattr(hit.meta, field_name))
+        if self._response is None:
+            # Nothing fetched yet, so fetch these hits with everything else.
+            self.prefetch(start, end)
+        hits = self._window_hits(start, end)
+        if hits is None:
+            hits = _flatten_hits(self._search[start:end].execute().hits)
 
         if isinstance(i, slice):
             return hits
@@ -437,7 +1211,56 @@ class SearchResults(object):
             return hits[0]
 
 
-def create_mapping():
+def _execute_cached(search):
+    """
+    Execute a search, using the search response cache if it's enabled.
+
+    Args:
+        search (elasticsearch_dsl.Search): Search to execute
+    Returns:
+        elasticsearch_dsl.result.Response: The response
+    """
+    if not settings.SEARCH_CACHE_ENABLED:
+        return search.execute()
+
+    # The request body is the normalized query. Keying on the generation
+    # as well means nothing cached before the last index write is used.
+    body = json.dumps(search.to_dict(), sort_keys=True)
+    key = "search_{generation}_{digest}".format(
+        generation=_index_generation(),
+        digest=hashlib.sha1(body.encode("utf-8")).hexdigest(),
+    )
+    cache = caches["lore_search"]
+    raw_response = cache.get(key)
+    if raw_response is not None:
+        return Response(raw_response)
+    response = search.execute()
+    # Cached before SearchResults changes the hits.
+    cache.set(key, vars(response)['_d_'])
+    return response
+
+
+def _flatten_hits(hits):
+    """
+    Replace the lists Elasticsearch returns for each field with the value.
+
+    Args:
+        hits (elasticsearch_dsl.result.AttrList): Hits from a response
+    Returns:
+        list: The same hits
+    """
+    hits = list(hits)
+    field_names = _get_field_names()
+    for hit in hits:
+        for field_name in field_names:
+            if field_name not in META_FIELDS_IN_RESULT:
+                setattr(hit, field_name, getattr(hit, field_name)[0])
+            else:
+                setattr(hit, field_name, getattr(hit.meta, field_name))
+    return hits
+
+
+def create_mapping(index_name=INDEX_NAME):
     """
     Delete and recreate the Elasticsearch mapping.
 
@@ -448,10 +1271,10 @@ def create_mapping():
         no: not indexed at all, but will be returned in search results
     """
     conn = get_conn(verify=False)
-    _create_mapping(conn)
+    _create_mapping(conn, index_name)
 
 
-def _create_mapping(conn):
+def _create_mapping(conn, index_name):
     """
     Actually create the mapping, including deleting it if it's there
     so we can create it.
@@ -459,8 +1282,8 @@ def _create_mapping(conn):
 
     # Delete the mapping if an older version exists.
 
-    if conn.indices.exists_type(index=INDEX_NAME, doc_type=DOC_TYPE):
-        conn.indices.delete_mapping(index=INDEX_NAME, doc_type=DOC_TYPE)
+    if conn.indices.exists_type(index=index_name, doc_type=DOC_TYPE):
+        conn.indices.delete_mapping(index=index_name, doc_type=DOC_TYPE)
 
     mapping = Mapping(DOC_TYPE)
     mapping.field("id", "integer")
@@ -470,7 +1293,6 @@ def _create_mapping(conn):
     mapping.field("preview_url", "string", index="no")
     mapping.field("repository", "string", index="not_analyzed")
     mapping.field("resource_type", "string", index="not_analyzed")
-    mapping.field("content_xml", "string", index="no")
     mapping.field("content_stripped", "string", index="analyzed")
     mapping.field("run", "string", index="not_analyzed")
     mapping.field("titlesort", "string", index="not_analyzed")
@@ -481,10 +1303,21 @@ def _create_mapping(conn):
     mapping.field("xa_nr_attempts", "integer")
     mapping.field("xa_nr_views", "integer")
 
-    mapping.save(INDEX_NAME)
+    for vocab_id in Vocabulary.objects.values_list("id", flat=True):
+        mapping.field(
+            make_vocab_key(vocab_id), "string", index="not_analyzed")
+
+    # The stripped content is only searched, never returned, so there's
+    # no need to keep a copy of it in _source.
+    mapping.meta("_source", excludes=["content_stripped"])
 
+    mapping.save(index_name)
+    _reset_verification()
+    clear_vocabulary_mapping_cache()
+    bump_index_generation()
 
-def refresh_index():
+
+def refresh_index(index_name=INDEX_NAME):
     """
     Force a refresh instead of waiting for it to happen automatically.
     This should only be necessary during tests.
@@ -493,51 +1326,126 @@ def refresh_index():
     _refresh_index() was created instead of just updating all existing calls
     to refresh_index() to call .delay() because that makes it easy to add any
     code that needs to call refresh_index in the future being aware of Celery.
+
+    Inside an indexing_session the refresh is put off until the session
+    ends.
     """
+    bump_index_generation()
+    if _session_depth() > 0:
+        _SESSION.refresh = True
+        return
     get_conn()
-    _refresh_index.delay(INDEX_NAME)
+    _refresh_index.delay(index_name)
+
+
+def bump_index_generation():
+    """
+    Stop serving search responses cached before now.
+
+    Called whenever the index changes, and again when a refresh makes the
+    change visible to searches.
+    """
+    if settings.SEARCH_CACHE_ENABLED:
+        caches["lore_search"].set(SEARCH_GENERATION_KEY, uuid4().hex, None)
+
+
+def _index_generation():
+    """Return the current generation of the index."""
+    cache = caches["lore_search"]
+    generation = cache.get(SEARCH_GENERATION_KEY)
+    if generation is None:
+        # Never set, or evicted. A new value can't match older entries.
+        cache.add(SEARCH_GENERATION_KEY, uuid4().hex, None)
+        generation = cache.get(SEARCH_GENERATION_KEY)
+    return generation
 
 
-def ensure_vocabulary_mappings(term_info):
+def ensure_vocabulary_mappings(term_info, index_name=INDEX_NAME):
     """
     Ensure the mapping is properly set in Elasticsearch to always do exact
     matches on taxonomy terms. Accepts the output of get_resource_terms.
 
-    Calling this function during indexing means that vocabularies do not
-    need to be added to the mapping in advance. This deals with the fact
-    that vocabularies can be added on-the-fly without having to play around
-    with extra signals.
+    Vocabularies are added to the mapping when they are created, and
+    indices are created with every vocabulary in their mapping. This
+    catches any which were missed, for instance because the index didn't
+    exist when the vocabulary was created. The vocabularies already in the
+    mapping are remembered, so this only contacts Elasticsearch when it
+    sees a vocabulary for the first time.
 
     Args:
         term_info (dict): Details of terms for a group of LearningResources.
+        index_name (unicode): Index or alias to update the mapping of
     """
     if len(term_info) == 0:
         return
 
-    get_conn()  # We don't need the return value; just for it to exist.
-
-    # Retrieve current mapping from Elasticsearch.
-    mapping = Mapping.from_es(index=INDEX_NAME, doc_type=DOC_TYPE)
-
-    # Get the field names from the mapping.
-    existing_vocabs = set(mapping.to_dict()["learningresource"]["properties"])
-
     # Get all the taxonomy names from the data.
-    vocab_ids = set()
+    vocab_keys = set()
     for vocab_terms in term_info.values():
         for vocab_id in vocab_terms.keys():
-            vocab_ids.add(vocab_id)
-    updated = False
+            vocab_keys.add(make_vocab_key(vocab_id))
+
+    mapped_keys = _MAPPED_VOCAB_KEYS.get(index_name, set())
+    if vocab_keys <= mapped_keys:
+        return
+
+    conn = get_conn()
+    if index_name not in _MAPPED_VOCAB_KEYS:
+        # Retrieve current mapping from Elasticsearch.
+        mapping = Mapping.from_es(index=index_name, doc_type=DOC_TYPE)
+        mapped_keys = set(mapping.to_dict()[DOC_TYPE]["properties"])
+        _MAPPED_VOCAB_KEYS[index_name] = mapped_keys
+
     # Add vocabulary to mapping if necessary.
-    for vocab_id in vocab_ids:
+    missing_keys = vocab_keys - mapped_keys
+    if len(missing_keys) > 0:
+        _put_vocabulary_mappings(conn, index_name, missing_keys)
+
+
+def add_vocabulary_mapping(vocab_id):
+    """
+    Add a new vocabulary to the mapping of the indices in use.
+
+    Args:
+        vocab_id (int): Primary key of the Vocabulary
+    """
+    try:
+        conn = get_conn()
         vocab_key = make_vocab_key(vocab_id)
-        if vocab_key in existing_vocabs:
-            continue
+        for index_name in _write_indices():
+            _put_vocabulary_mappings(conn, index_name, [vocab_key])
+    except ReindexException:
+        # There's no index yet. It'll get the vocabulary when it's made.
+        pass
+    except ESConnectionError:
+        # Don't stop the vocabulary being created. The mapping will be
+        # added when its terms are first indexed.
+        log.exception("Unable to add vocabulary %s to mapping", vocab_id)
+
+
+def clear_vocabulary_mapping_cache():
+    """
+    Forget which vocabularies are known to be in the mapping.
+    """
+    _MAPPED_VOCAB_KEYS.clear()
+
+
+def _put_vocabulary_mappings(conn, index_name, vocab_keys):
+    """
+    Add vocabulary fields to the mapping of an index.
+
+    Args:
+        conn (elasticsearch.Elasticsearch): Connection
+        index_name (unicode): Index or alias
+        vocab_keys (iterable): Keys from make_vocab_key
+    """
+    mapping = Mapping(DOC_TYPE)
+    for vocab_key in vocab_keys:
         mapping.field(vocab_key, "string", index="not_analyzed")
-        updated = True
-    if updated:
-        mapping.save(INDEX_NAME)
-        refresh_index()
+    conn.indices.put_mapping(
+        index=index_name, doc_type=DOC_TYPE, body=mapping.to_dict())
+    if index_name in _MAPPED_VOCAB_KEYS:
+        _MAPPED_VOCAB_KEYS[index_name].update(vocab_keys)
 
 
 def strip_xml(content):
@@ -548,20 +1456,34 @@ def strip_xml(content):
     Returns:
         output (unicode): plain text
     """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    if "<" not in content:
+        # Nothing to strip, and not worth failing to parse.
+        return content
     try:
         # Strip XML tags from content before indexing.
-        tree = etree.fromstring(content)
-        content = etree.tostring(tree, encoding="utf-8", method="text")
+        return element_text(etree.fromstring(content))
     except etree.XMLSyntaxError:
         # For blank/invalid XML.
-        pass
-    try:
-        content = content.decode('utf-8')
-    except AttributeError:
-        # For Python 3.
-        pass
+        return content
+
 
-    return content
+def element_text(element):
+    """
+    Get the text inside an XML element, without markup.
+
+    lxml serializing to text in C is faster than walking the text
+    nodes from Python.
+
+    Args:
+        element (lxml.etree._Element): Parsed XML
+    Returns:
+        output (unicode): plain text
+    """
+    return etree.tostring(
+        element, encoding="utf-8", method="text", with_tail=False
+    ).decode('utf-8')
 
 
 # pylint: disable=too-many-locals
@@ -581,26 +1503,6 @@ def convert_aggregate(agg):
         'resource_type': 'Item Type',
     }
 
-    vocab_lookup = {}
-    term_lookup = {}
-    for term in Term.objects.all():
-        term_lookup[term.id] = term.label
-
-    for vocab in Vocabulary.objects.all():
-        vocab_lookup[make_vocab_key(vocab.id)] = vocab.name
-
-    def get_vocab_label(vocab_key):
-        """Get label for vocab."""
-        return vocab_lookup.get(vocab_key, vocab_key)
-
-    def get_term_label(term_id):
-        """Get label for term."""
-        return term_lookup.get(int(term_id), str(term_id))
-
-    def get_builtin_label(key):
-        """Get label for special types."""
-        return special_labels.get(key, key)
-
     # Group into fields.
     vocab_buckets = defaultdict(dict)
     builtin_buckets = defaultdict(dict)
@@ -616,6 +1518,38 @@ def convert_aggregate(agg):
             builtin_buckets[key]['buckets'] = value['buckets']
             # No missing counts for run, course, resource_types.
 
+    # Only look up labels for the vocabularies and terms in the results.
+    vocab_ids = {
+        vocab_id for vocab_id in (_vocab_id(key) for key in vocab_buckets)
+        if vocab_id is not None
+    }
+    term_ids = {
+        int(facet['key'])
+        for buckets_and_missing in vocab_buckets.values()
+        for facet in buckets_and_missing['buckets']
+    }
+    version = None
+    if len(vocab_ids) > 0 or len(term_ids) > 0:
+        version = get_label_version()
+    vocab_lookup = {
+        make_vocab_key(vocab_id): name
+        for vocab_id, name in get_vocabulary_labels(
+            vocab_ids, version).items()
+    }
+    term_lookup = get_term_labels(term_ids, version)
+
+    def get_vocab_label(vocab_key):
+        """Get label for vocab."""
+        return vocab_lookup.get(vocab_key, vocab_key)
+
+    def get_term_label(term_id):
+        """Get label for term."""
+        return term_lookup.get(int(term_id), str(term_id))
+
+    def get_builtin_label(key):
+        """Get label for special types."""
+        return special_labels.get(key, key)
+
     reformatted = {}
     for key, buckets_and_missing in vocab_buckets.items():
         buckets = buckets_and_missing['buckets']
@@ -661,3 +1595,21 @@ def convert_aggregate(agg):
         }
 
     return reformatted
+
+
+def _vocab_id(vocab_key):
+    """
+    Get the Vocabulary id back from a key made by make_vocab_key.
+
+    Args:
+        vocab_key (unicode): Field name of a vocabulary
+    Returns:
+        int: Vocabulary id, or None if vocab_key isn't a vocabulary key
+    """
+    prefix = make_vocab_key("")
+    if not vocab_key.startswith(prefix):
+        return None
+    try:
+        return int(vocab_key[len(prefix):])
+    except ValueError:
+        return None
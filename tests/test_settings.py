@@ -131,6 +131,24 @@ class TestSettings(TestCase):
                 'storages.backends.s3boto.S3BotoStorage'
             )
 
+    def test_search_cache_settings(self):
+        """Verify that the search cache needs a shared backend"""
+        with self.assertRaises(ImproperlyConfigured):
+            with mock.patch.dict('os.environ', {
+                'LORE_SEARCH_CACHE_ENABLED': 'True',
+            }, clear=True):
+                self.reload_settings()
+
+        with mock.patch.dict('os.environ', {
+            'LORE_SEARCH_CACHE_ENABLED': 'True',
+            'LORE_SEARCH_CACHE_BACKEND': (
+                'django.core.cache.backends.memcached.MemcachedCache'
+            ),
+            'LORE_SEARCH_CACHE_LOCATION': '127.0.0.1:11211',
+        }, clear=True):
+            settings_vars = self.reload_settings()
+            self.assertTrue(settings_vars['SEARCH_CACHE_ENABLED'])
+
     def test_admin_settings(self):
         """Verify that we configure email with environment variable"""
 
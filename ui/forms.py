@@ -10,7 +10,7 @@ import uuid
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.forms import (
-    Form, FileField, ValidationError, ModelForm,
+    Form, BooleanField, FileField, ValidationError, ModelForm,
 )
 from django.db import transaction
 
@@ -26,6 +26,10 @@ class UploadForm(Form):
     Form for allowing a user to upload an OLX course archive
     """
     course_file = FileField()
+    incremental = BooleanField(
+        required=False,
+        label="Update courses which were imported before",
+    )
 
     def __init__(self, *args, **kwargs):
         """
@@ -68,7 +72,8 @@ class UploadForm(Form):
             ),
             uploaded_file
         )
-        task = import_file.delay(path, repo_id, user_id)
+        task = import_file.delay(
+            path, repo_id, user_id, self.cleaned_data["incremental"])
 
         repo_slug = Repository.objects.get(id=repo_id).slug
         # Save task data in session so we can keep track of it.
@@ -210,12 +210,17 @@ def serve_static_assets(request, path):
     # first check if the user has access to the file
     media_path = os.path.join(STATIC_ASSET_PREFIX, path)
     file_path = os.path.join(settings.MEDIA_ROOT, media_path)
-    static_assets = StaticAsset.objects.filter(asset=media_path)
+    static_assets = StaticAsset.objects.filter(
+        asset=media_path).select_related("course__repository")
     if not static_assets:
         raise Http404()
-    static_asset = static_assets.first()
-    if (RepoPermission.view_repo[0] not in
-            get_perms(request.user, static_asset.course.repository)):
+    # Deduplicated assets share a file between courses, so access to
+    # any of them is enough.
+    if not any(
+            RepoPermission.view_repo[0] in
+            get_perms(request.user, static_asset.course.repository)
+            for static_asset in static_assets
+    ):
         raise PermissionDenied()
     filename = os.path.basename(file_path)
     response = StreamingHttpResponse(